@@ -0,0 +1,616 @@
+"""
+Benchmarks for the hot paths of the game: bird physics, pipe collision,
+network activation and whole generations. Every scenario uses fixed
+seeds, runs without a display and reports frames/sec, bird-frames/sec
+and peak memory. Results can be saved as a baseline JSON file and later
+runs compared against it.
+
+    python flappy_bench.py --save bench.json
+    python flappy_bench.py --compare bench.json
+"""
+import os
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")  # geen scherm nodig, moet voor pygame.init
+
+import argparse
+import contextlib
+import io
+import itertools
+import json
+import multiprocessing
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+import neat
+import flappy_bird_neat
+import flappy_core
+import flappy_env
+import flappy_nets
+import flappy_profile
+import flappy_spectate
+from flappy_core import Bird, Pipe, FLOOR
+
+SEED = 1234
+
+
+def make_genomes(config, count, seed=SEED, mutations=5):
+    """
+    a reproducible population: new genomes with a few mutations each
+    :param config: neat config
+    :param count: number of genomes (int)
+    :param seed: int
+    :param mutations: mutations per genome (int)
+    :return: list of genomes
+    """
+    state = random.getstate()
+    pop_size = config.pop_size
+    random.seed(seed)
+    try:
+        config.pop_size = count
+        genomes = list(neat.Population(config).population.values())
+        for genome in genomes:
+            for _ in range(mutations):
+                genome.mutate(config.genome_config)
+    finally:
+        config.pop_size = pop_size
+        random.setstate(state)
+    return genomes
+
+
+def jump_schedule(birds, frames, seed=SEED):
+    """
+    which bird jumps in which frame, about one jump every 20 frames
+    :return: bool array of shape (frames, birds)
+    """
+    return np.random.default_rng(seed).random((frames, birds)) < 0.05
+
+
+def bench_bird_move(config, birds, frames):
+    """
+    Bird.move for every bird, one Bird object per genome
+    :return: function that plays the frames and returns (frames, bird frames)
+    """
+    jumps = jump_schedule(birds, frames)
+    flock = [Bird(230, 350) for _ in range(birds)]
+
+    def play():
+        for row in jumps:
+            for bird, jump in zip(flock, row):
+                if jump:
+                    bird.jump()
+                bird.move()
+        return frames, birds * frames
+    return play
+
+
+def bench_population_move(config, birds, frames):
+    """
+    the same jumps as bench_bird_move with flappy_sim.BirdPopulation
+    """
+    jumps = jump_schedule(birds, frames)
+    flock = flappy_core.bird_population(birds)
+
+    def play():
+        for row in jumps:
+            flock.jump(row)
+            flock.move()
+        return frames, birds * frames
+    return play
+
+
+def dense_traffic(birds, frames, spacing=120):
+    """
+    birds spread over the screen height and a pipe every spacing pixels,
+    so there is always a pipe over the birds
+    :return: (pipes, bird y positions)
+    """
+    rng = random.Random(SEED)
+    pipes = [Pipe(230 + i * spacing, rng.randrange(50, 450))
+             for i in range(frames * Pipe.VEL // spacing + 2)]
+    ys = [rng.uniform(0, FLOOR - 40) for _ in range(birds)]
+    return pipes, ys
+
+
+def bench_pipe_collide(config, birds, frames):
+    """
+    Pipe.collide of every bird with every pipe over the birds
+    """
+    pipes, ys = dense_traffic(birds, frames)
+    flock = [Bird(230, y) for y in ys]
+
+    def play():
+        for _ in range(frames):
+            for pipe in pipes:
+                pipe.move()
+                if pipe.x < 300 and pipe.x + Pipe.WIDTH > 230:
+                    for bird in flock:
+                        pipe.collide(bird, None)
+        return frames, birds * frames
+    return play
+
+
+def bench_population_collide(config, birds, frames):
+    """
+    the same traffic as bench_pipe_collide with BirdPopulation.collide
+    and the extent narrow phase, nobody dies so every frame tests every bird
+    """
+    pipes, ys = dense_traffic(birds, frames)
+    flock = flappy_core.bird_population(birds)
+    flock.y[:] = ys
+
+    def play():
+        for _ in range(frames):
+            for pipe in pipes:
+                pipe.move()
+                if pipe.x < 300 and pipe.x + Pipe.WIDTH > 230:
+                    flock.alive[:] = True
+                    flock.collide(pipe.x, pipe.height, pipe.bottom, flappy_core.extent_narrow_phase)
+        return frames, birds * frames
+    return play
+
+
+def bench_activate(config, birds, frames):
+    """
+    FeedForwardNetwork.activate, one call per bird per frame
+    """
+    nets = [neat.nn.FeedForwardNetwork.create(g, config) for g in make_genomes(config, birds)]
+    inputs = np.random.default_rng(SEED).uniform(0, 700, (frames, birds, 3)).tolist()
+
+    def play():
+        for row in inputs:
+            for net, x in zip(nets, row):
+                net.activate(x)
+        return frames, birds * frames
+    return play
+
+
+def bench_batch_activate(config, birds, frames):
+    """
+    the same networks and inputs as bench_activate with flappy_nets.BatchNetwork
+    """
+    nets = flappy_nets.BatchNetwork.create(make_genomes(config, birds), config)
+    inputs = np.random.default_rng(SEED).uniform(0, 700, (frames, birds, 3))
+
+    def play():
+        for x in inputs:
+            nets.activate(x)
+        return frames, birds * frames
+    return play
+
+
+def bench_champion_activate(config, birds, frames):
+    """
+    the same networks and inputs as bench_activate with flappy_nets.Champion,
+    one decision at a time like a single bird would ask
+    """
+    nets = [flappy_nets.Champion.create(g, config) for g in make_genomes(config, birds)]
+    inputs = np.random.default_rng(SEED).uniform(0, 700, (frames, birds, 3)).tolist()
+
+    def play():
+        for row in inputs:
+            for net, x in zip(nets, row):
+                net.activate(x)
+        return frames, birds * frames
+    return play
+
+
+def start_spectator(capacity, fps=60):
+    """
+    a window process like flappy_bird_neat.spectate, with the dummy
+    video driver. Returns once the window has shown its first snapshot.
+    :param capacity: most birds in a snapshot (int)
+    :param fps: frames drawn per second (int)
+    :return: (flappy_spectate.SnapshotBuffer, multiprocessing.Process)
+    """
+    buffer = flappy_spectate.SnapshotBuffer(capacity)
+    window = multiprocessing.Process(target=flappy_bird_neat.spectator_window, daemon=True,
+                                     args=(buffer.name, capacity, buffer.lock, fps))
+    window.start()
+    buffer.publish([], [], flappy_core.PipeQueue(), 0, (0, 0), 0)
+    while not buffer.wants():
+        time.sleep(0.01)
+    return buffer, window
+
+
+def stop_spectator(buffer, window):
+    """
+    close a window of start_spectator
+    :return: None
+    """
+    buffer.stop()
+    window.join()
+    buffer.close()
+
+
+def bench_generation(config, birds, frames, fast_forward=False, spectate=False):
+    """
+    a whole generation with flappy_core.simulate, the game decides how
+    many frames it takes so frames is not used
+    """
+    genomes = make_genomes(config, birds)
+    spectator = start_spectator(birds) if spectate else None
+
+    def play():
+        counter = flappy_profile.FrameProfiler(enabled=True)
+        try:
+            flappy_core.simulate(genomes, config, flappy_core.Course(SEED), counter, fast_forward,
+                                 spectator=spectator[0] if spectator else None)
+        finally:
+            if spectator:
+                stop_spectator(*spectator)
+        # in elk frame leven de vogels die aan het eind van het vorige frame nog leefden
+        alive = [birds] + [a for a, _ in counter.frames[:-1]]
+        return len(counter.frames), sum(alive)
+    return play
+
+
+def bench_eval_genomes(config, birds, frames, spectate=False):
+    """
+    the same generation as bench_generation, played by the Bird objects
+    of flappy_bird_neat.eval_genomes, headless and without the network cache
+    """
+    genomes = [(genome.key, genome) for genome in make_genomes(config, birds)]
+    game = flappy_bird_neat
+    spectator = start_spectator(birds) if spectate else None
+
+    def play():
+        counter = flappy_profile.FrameProfiler(enabled=True)
+        saved = game.HEADLESS, game.COURSE_SEEDS, game.NET_CACHE, game.SPECTATOR, flappy_profile.PROFILER
+        game.HEADLESS, game.COURSE_SEEDS, game.NET_CACHE = True, itertools.repeat(SEED), None
+        game.SPECTATOR = spectator[0] if spectator else None
+        flappy_profile.PROFILER = counter
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):   # eval_genomes print elke generatie een samenvatting
+                game.eval_genomes(genomes, config)
+        finally:
+            game.HEADLESS, game.COURSE_SEEDS, game.NET_CACHE, game.SPECTATOR, flappy_profile.PROFILER = saved
+            if spectator:
+                stop_spectator(*spectator)
+        alive = [birds] + [a for a, _ in counter.frames[:-1]]
+        return len(counter.frames), sum(alive)
+    return play
+
+
+def bench_generation_fast_forward(config, birds, frames):
+    """
+    bench_generation with the fast forward of flappy_core.simulate
+    """
+    return bench_generation(config, birds, frames, fast_forward=True)
+
+
+def bench_generation_spectate(config, birds, frames):
+    """
+    bench_generation while a spectator window draws snapshots at 60 fps,
+    what watching costs the training
+    """
+    return bench_generation(config, birds, frames, spectate=True)
+
+
+def bench_eval_genomes_spectate(config, birds, frames):
+    """
+    bench_eval_genomes while a spectator window draws snapshots at 60 fps
+    """
+    return bench_eval_genomes(config, birds, frames, spectate=True)
+
+
+def bench_courses(config, birds, frames, courses=8):
+    """
+    a generation on several courses at once with flappy_env.play_courses,
+    birds genomes on every course
+    """
+    genomes = make_genomes(config, birds)
+    seeds = flappy_core.MultiCourse(courses).seeds(SEED)
+
+    def play():
+        counter = flappy_profile.FrameProfiler(enabled=True)
+        flappy_env.play_courses(genomes, config, seeds, profiler=counter)
+        alive = [birds * courses] + [a for a, _ in counter.frames[:-1]]
+        return len(counter.frames), sum(alive)
+    return play
+
+
+def bench_vec_env(config, birds, frames):
+    """
+    flappy_env.FlappyVecEnv with one game per bird and the jumps of
+    bench_bird_move, finished games restart so every step plays all games
+    """
+    jumps = jump_schedule(birds, frames)
+    env = flappy_env.FlappyVecEnv(birds, seed=SEED)
+    env.reset()
+
+    def play():
+        for row in jumps:
+            env.step(row)
+        return frames, birds * frames
+    return play
+
+
+def verify_fast_forward(config, populations=(20, 200), seeds=range(10)):
+    """
+    differential test: flappy_core.simulate must give exactly the same
+    fitness with and without fast_forward
+    :param config: neat config
+    :param populations: population sizes to try
+    :param seeds: seeds of the genomes and the pipe courses
+    :return: number of mismatches (int)
+    """
+    mismatches = 0
+    for birds in populations:
+        for seed in seeds:
+            genomes = make_genomes(config, birds, seed)
+            slow = flappy_core.simulate(genomes, config, flappy_core.Course(seed))
+            fast = flappy_core.simulate(genomes, config, flappy_core.Course(seed), fast_forward=True)
+            if not np.array_equal(slow, fast):
+                mismatches += 1
+                print("fast forward mismatch: {} birds, seed {}, {} genomes differ".format(
+                    birds, seed, int((slow != fast).sum())))
+    print("fast forward: {} games checked, {} mismatches".format(len(populations) * len(seeds), mismatches))
+    return mismatches
+
+
+def verify_bounds(birds=200, frames=2000, seed=SEED):
+    """
+    brute force test for the fast forward of simulate: after
+    BirdPopulation.frames_until_out_possible no bird may hit the floor or
+    fly over the ceiling before the frame it gives, in games where every
+    bird jumps at its own random rate and dead birds start over
+    :param birds: number of birds (int)
+    :param frames: frames to play (int)
+    :param seed: int
+    :return: number of mismatches (int)
+    """
+    rng = np.random.default_rng(seed)
+    rates = rng.uniform(0, 0.3, birds)   # van bijna nooit springen tot tegen het plafond
+    population = flappy_core.bird_population(birds)
+    born = np.zeros(birds, dtype=np.int64)
+    events = np.zeros(frames + 1, dtype=np.int64)   # per frame het frame van de volgende bounds test
+    mismatches = deaths = 0
+    for frame in range(1, frames + 1):
+        population.move()
+        population.jump(rng.random(birds) < rates)
+        for row in np.flatnonzero(population.kill_out_of_bounds(FLOOR)):
+            deaths += 1
+            # elke bounds test die na dit frame gepland werd terwijl de vogel leefde was te laat
+            if events[born[row]:frame].max() > frame:
+                mismatches += 1
+                print("bounds mismatch: bird {} left the screen in frame {}, too early for the fast forward".format(
+                    row, frame))
+        born[~population.alive] = frame
+        population.reset(~population.alive)
+        events[frame] = frame + population.frames_until_out_possible(FLOOR)
+    print("bounds: {} frames with {} deaths checked, {} mismatches".format(frames, deaths, mismatches))
+    return mismatches
+
+
+def verify_env(config, populations=(20, 200), seeds=range(10)):
+    """
+    differential test: the rewards of a flappy_env.FlappyVecEnv game must
+    add up to the fitness flappy_core.simulate gives the same genome
+    :param config: neat config
+    :param populations: population sizes to try, one game per genome
+    :param seeds: seeds of the genomes and the pipe courses
+    :return: number of mismatches (int)
+    """
+    mismatches = 0
+    for birds in populations:
+        for seed in seeds:
+            genomes = make_genomes(config, birds, seed)
+            fitness = flappy_core.simulate(genomes, config, flappy_core.Course(seed))
+            nets = flappy_nets.BatchNetwork.create(genomes, config)
+            env = flappy_env.FlappyVecEnv(birds)
+            obs = env.reset([seed] * birds)
+            total = np.zeros(birds)
+            playing = np.ones(birds, dtype=bool)   # alleen het eerste spel telt, daarna wordt er gereset
+            while playing.any():
+                obs, rewards, dones, info = env.step(nets.activate(obs)[:, 0] > 0.5)
+                total[playing] += rewards[playing]
+                playing &= ~dones
+            if not np.allclose(total, fitness, rtol=0, atol=1e-9):
+                mismatches += 1
+                print("environment mismatch: {} birds, seed {}, {} genomes differ".format(
+                    birds, seed, int((~np.isclose(total, fitness, rtol=0, atol=1e-9)).sum())))
+    print("environment: {} games checked, {} mismatches".format(len(populations) * len(seeds), mismatches))
+    return mismatches
+
+
+def verify_champion(config, birds=200, inputs=500, seed=SEED):
+    """
+    round trip test: a flappy_nets.Champion saved and loaded again must
+    give the outputs of neat's FeedForwardNetwork, through activate and
+    activate_many, and never take a different jump decision
+    :param config: neat config
+    :param birds: number of genomes to export (int)
+    :param inputs: inputs per genome, game like values (int)
+    :param seed: int
+    :return: number of mismatches (int)
+    """
+    rng = np.random.default_rng(seed)
+    samples = np.column_stack([rng.uniform(-50, FLOOR, inputs), rng.uniform(0, 800, inputs),
+                               rng.uniform(0, 800, inputs)])
+    mismatches = flipped = 0
+    worst = 0.0
+    path = os.path.join(tempfile.mkdtemp(), "champion.npz")
+    try:
+        for genome in make_genomes(config, birds, seed, mutations=20):
+            genome.fitness = float(genome.key)
+            flappy_nets.Champion.create(genome, config).save(path)
+            champion = flappy_nets.Champion.load(path)
+            net = neat.nn.FeedForwardNetwork.create(genome, config)
+            expected = np.array([net.activate(x) for x in samples.tolist()])
+            one = np.array([champion.activate(x) for x in samples.tolist()])
+            many = champion.activate_many(samples)
+            worst = max(worst, float(np.abs(one - expected).max()), float(np.abs(many - expected).max()))
+            flips = int(((one > 0.5) != (expected > 0.5)).sum() + ((many > 0.5) != (expected > 0.5)).sum())
+            flipped += flips
+            if flips or not (np.allclose(one, expected, rtol=0, atol=1e-9) and
+                             np.allclose(many, expected, rtol=0, atol=1e-9)):
+                mismatches += 1
+                print("champion mismatch: genome {}, {} decisions flipped".format(genome.key, flips))
+            if champion.meta["genome_key"] != genome.key or champion.meta["fitness"] != genome.fitness:
+                mismatches += 1
+                print("champion mismatch: genome {}, meta {}".format(genome.key, champion.meta))
+    finally:
+        os.remove(path)
+        os.rmdir(os.path.dirname(path))
+    print("champion: {} networks checked, {} decisions flipped, largest difference {:.1e}, {} mismatches".format(
+        birds, flipped, worst, mismatches))
+    return mismatches
+
+
+def verify_extents():
+    """
+    exhaustive test: the row extent overlap tables must agree with
+    mask.overlap for every bird animation frame, both pipes and every
+    offset at which the rectangles touch, plus a margin around them.
+    The tilt does not matter, the masks are of the unrotated images.
+    :return: number of mismatches (int)
+    """
+    mismatches = checked = 0
+    pipes = (("top", Pipe.TOP_MASK, Pipe.TOP_OVERLAP), ("bottom", Pipe.BOTTOM_MASK, Pipe.BOTTOM_OVERLAP))
+    for frame, img in enumerate(Bird.IMGS):
+        bird_mask = Bird.MASKS[img]
+        bird_w, bird_h = bird_mask.get_size()
+        for name, pipe_mask, overlap in pipes:
+            pipe_w, pipe_h = pipe_mask.get_size()
+            dys = np.arange(-pipe_h - 2, bird_h + 3)
+            for dx in range(-pipe_w - 2, bird_w + 3):
+                expected = np.array([bird_mask.overlap(pipe_mask, (dx, int(dy))) is not None for dy in dys])
+                wrong = int((overlap[img](dx, dys) != expected).sum())
+                checked += len(dys)
+                if wrong:
+                    mismatches += wrong
+                    print("extent mismatch: bird frame {}, {} pipe, dx {}, {} offsets differ".format(
+                        frame, name, dx, wrong))
+    print("extents: {} offsets checked, {} mismatches".format(checked, mismatches))
+    return mismatches
+
+
+# (name, function, birds, frames)
+SCENARIOS = [
+    ("bird_move", bench_bird_move, 200, 500),
+    ("population_move", bench_population_move, 200, 500),
+    ("pipe_collide", bench_pipe_collide, 200, 200),
+    ("population_collide", bench_population_collide, 200, 200),
+    ("activate", bench_activate, 200, 200),
+    ("batch_activate", bench_batch_activate, 200, 200),
+    ("champion_activate", bench_champion_activate, 200, 200),
+    ("eval_genomes_20", bench_eval_genomes, 20, 0),
+    ("eval_genomes_200", bench_eval_genomes, 200, 0),
+    ("eval_genomes_2000", bench_eval_genomes, 2000, 0),
+    ("eval_genomes_2000_spectate", bench_eval_genomes_spectate, 2000, 0),
+    ("generation_20", bench_generation, 20, 0),
+    ("generation_200", bench_generation, 200, 0),
+    ("generation_2000", bench_generation, 2000, 0),
+    ("generation_2000_ff", bench_generation_fast_forward, 2000, 0),
+    ("generation_2000_spectate", bench_generation_spectate, 2000, 0),
+    ("courses_200x8", bench_courses, 200, 0),
+    ("vec_env", bench_vec_env, 2000, 200),
+]
+
+
+def measure(config, bench, birds, frames, repeat):
+    """
+    time a scenario, best of repeat runs, and measure its peak memory in
+    a separate run because tracemalloc slows everything down
+    :return: dict with the results
+    """
+    best = None
+    for _ in range(repeat):
+        play = bench(config, birds, frames)
+        start = time.perf_counter()
+        played, bird_frames = play()
+        seconds = time.perf_counter() - start
+        if best is None or seconds < best:
+            best = seconds
+
+    tracemalloc.start()
+    bench(config, birds, frames)()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return {
+        "birds": birds,
+        "frames": played,
+        "seconds": best,
+        "fps": played / best,
+        "bird_fps": bird_frames / best,
+        "peak_kb": peak / 1024,
+    }
+
+
+def compare(results, baseline, tolerance):
+    """
+    print the speed of every scenario relative to the baseline
+    :param results: dict of measure() results per scenario
+    :param baseline: the same, loaded from a baseline file
+    :param tolerance: allowed slowdown as a fraction (float)
+    :return: list with the names of the scenarios that got slower
+    """
+    slower = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        ratio = result["bird_fps"] / baseline[name]["bird_fps"]
+        flag = ""
+        if ratio < 1 - tolerance:
+            slower.append(name)
+            flag = "  REGRESSION"
+        print("{:<26} {:>6.2f}x baseline{}".format(name, ratio, flag))
+    return slower
+
+
+def main(argv=None):
+    local_dir = os.path.dirname(os.path.abspath(__file__))
+    parser = argparse.ArgumentParser(description="Benchmark the flappy bird simulation")
+    parser.add_argument("--config", default=os.path.join(local_dir, "config-feedforward.txt"),
+                        help="NEAT config file")
+    parser.add_argument("--only", nargs="*", default=None, help="names of the scenarios to run")
+    parser.add_argument("--quick", action="store_true", help="a tenth of the birds and frames, one run each")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per scenario, the best counts")
+    parser.add_argument("--verify", action="store_true",
+                        help="only check that the fast forward never tests the floor and ceiling too late, "
+                             "that it and flappy_env give the same fitness as simulate, that a saved champion "
+                             "plays like its genome and that the extent collision agrees with the masks")
+    parser.add_argument("--save", default=None, help="write the results to this baseline JSON file")
+    parser.add_argument("--compare", default=None, help="compare with this baseline JSON file")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="allowed slowdown against the baseline before failing (fraction)")
+    args = parser.parse_args(argv)
+
+    config = neat.config.Config(neat.DefaultGenome, neat.DefaultReproduction,
+                                neat.DefaultSpeciesSet, neat.DefaultStagnation, args.config)
+    if args.verify:
+        failed = (verify_bounds() + verify_fast_forward(config) + verify_env(config) +
+                  verify_champion(config) + verify_extents())
+        return 1 if failed else 0
+    repeat = 1 if args.quick else args.repeat
+
+    results = {}
+    print("{:<26} {:>6} {:>6} {:>10} {:>12} {:>14} {:>10}".format(
+        "scenario", "birds", "frames", "seconds", "frames/s", "bird-frames/s", "peak KiB"))
+    for name, bench, birds, frames in SCENARIOS:
+        if args.only and name not in args.only:
+            continue
+        if args.quick:
+            birds, frames = max(birds // 10, 1), max(frames // 10, 1)
+        result = measure(config, bench, birds, frames, repeat)
+        results[name] = result
+        print("{:<26} {:>6} {:>6} {:>10.4f} {:>12.1f} {:>14.1f} {:>10.1f}".format(
+            name, birds, result["frames"], result["seconds"], result["fps"], result["bird_fps"], result["peak_kb"]))
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if compare(results, baseline, args.tolerance):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,23 +1,34 @@
 import pygame
 import random
 import os
-import time
-pygame.font.init()  # init font
+import argparse
+import numpy as np
+import neat
+import flappy_core
+import flappy_nets
+import flappy_replay
+from flappy_bird_neat import DirtyRenderer
+from flappy_core import ASSETS, asset, font
 
 WIN_WIDTH = 600
 WIN_HEIGHT = 800
 PIPE_VEL = 3
 FLOOR = 730
-STAT_FONT = pygame.font.SysFont("comicsans", 50)
-END_FONT = pygame.font.SysFont("comicsans", 70)
 
-WIN = pygame.display.set_mode((WIN_WIDTH, WIN_HEIGHT))
-pygame.display.set_caption("Flappy Bird")
+WIN = None  # pas bij het eerste tekenen, zie get_window()
+RENDERER = DirtyRenderer()  # tekent alleen wat veranderde, zie flappy_bird_neat
 
-pipe_img = pygame.transform.scale2x(pygame.image.load(os.path.join("imgs","pipe.png")).convert_alpha())
-bg_img = pygame.transform.scale(pygame.image.load(os.path.join("imgs","bg.png")).convert_alpha(), (600, 900))
-bird_images = [pygame.transform.scale2x(pygame.image.load(os.path.join("imgs","bird" + str(x) + ".png"))) for x in range(1,4)]
-base_img = pygame.transform.scale2x(pygame.image.load(os.path.join("imgs","base.png")).convert_alpha())
+def get_window():
+    """
+    # maakt het venster bij het eerste gebruik
+    :return: pygame window surface
+    """
+    global WIN
+    if WIN is None:
+        WIN = pygame.display.set_mode((WIN_WIDTH, WIN_HEIGHT))
+        pygame.display.set_caption("Flappy Bird")
+        flappy_core.convert_images()
+    return WIN
 
 class Bird:
     """
@@ -26,7 +37,7 @@ class Bird:
     WIN_HEIGHT = 0
     WIN_WIDTH = 0
     MAX_ROTATION = 25
-    IMGS = bird_images
+    IMGS = asset("bird_images")
     ROT_VEL = 20
     ANIMATION_TIME = 5
 
@@ -144,8 +155,8 @@ class Pipe():
         self.top = 0
         self.bottom = 0
 
-        self.PIPE_TOP = pygame.transform.flip(pipe_img, False, True)
-        self.PIPE_BOTTOM = pipe_img
+        self.PIPE_TOP = ASSETS.pipe_top
+        self.PIPE_BOTTOM = ASSETS.pipe_img
 
         self.passed = False
 
@@ -205,8 +216,8 @@ class Base:
     """
     VEL = 5
     WIN_WIDTH = WIN_WIDTH
-    WIDTH = base_img.get_width()
-    IMG = base_img
+    WIDTH = asset("base_width")
+    IMG = asset("base_img")
 
     def __init__(self, y):
         """
@@ -241,108 +252,109 @@ class Base:
         win.blit(self.IMG, (self.x2, self.y))
 
 
-    def blitRotateCenter(surf, image, topleft, angle):
-        """
-        # kantelt een oppervlak en het blijft bij de window
-        :param surf: the surface to blit to
-        :param image: the image surface to rotate
-        :param topLeft: the top left position of the image
-        :param angle: a float value for angle
-        :return: None
-        """
-        rotated_image = pygame.transform.rotate(image, angle)
-        new_rect = rotated_image.get_rect(center = image.get_rect(topleft = topleft).center)
+def blitRotateCenter(surf, image, topleft, angle):
+    """
+    # kantelt een oppervlak en het blijft bij de window
+    :param surf: the surface to blit to
+    :param image: the image surface to rotate
+    :param topLeft: the top left position of the image
+    :param angle: a float value for angle
+    :return: None
+    """
+    rotated_image = pygame.transform.rotate(image, angle)
+    new_rect = rotated_image.get_rect(center = image.get_rect(topleft = topleft).center)
 
-        surf.blit(rotated_image, new_rect.topleft)
+    surf.blit(rotated_image, new_rect.topleft)
 
-    def menu_screen(win):
-        """
-        # het menu scherm begint het spel
-        :param win: the pygame window surface
-        :return: None
-        """
-        pass
+def menu_screen(win):
+    """
+    # het menu scherm begint het spel
+    :param win: the pygame window surface
+    :return: None
+    """
+    pass
 
-    def end_screen(win):
-        """
-        # laadt het scherm aan het eind van het spel wanneer de speler verliest 
-        :param win: the pygame window surface
-        :return: None
-        """
-        run = True
-        text_label = END_FONT.render("Press Space to Restart", 1, (255,255,255))
-        while run:
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    run = False
+def end_screen(win):
+    """
+    # laadt het scherm aan het eind van het spel wanneer de speler verliest 
+    :param win: the pygame window surface
+    :return: None
+    """
+    run = True
+    text_label = font(70).render("Press Space to Restart", 1, (255,255,255))
+    while run:
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                run = False
 
-                if event.type == pygame.KEYDOWN:
-                    main(win)
+            if event.type == pygame.KEYDOWN:
+                main(win)
 
-            win.blit(text_label, (WIN_WIDTH/2 - text_label.get_width()/2, 500))
-            pygame.display.update()
+        win.blit(text_label, (WIN_WIDTH/2 - text_label.get_width()/2, 500))
+        pygame.display.update()
 
-        pygame.quit()
-        quit()
+    pygame.quit()
+    quit()
 
-    def draw_window(win, birds, pipes, base, score):
-        """
-        # tekent de windows voor het primaire spel rondje 
-        :param win: pygame window surface
-        :param bird: a Bird object
-        :param pipes: List of pipes
-        :param score: score of the game (int)
-        :return: None
-        """
-        win.blit(bg_img, (0,0))
-    
-        for pipe in pipes:
-            pipe.draw(win)
+def draw_window(win, birds, pipes, base, score):
+    """
+    # tekent de windows voor het primaire spel rondje 
+    :param win: pygame window surface
+    :param bird: a Bird object
+    :param pipes: List of pipes
+    :param score: score of the game (int)
+    :return: None
+    """
+    win.blit(ASSETS.bg_img, (0,0))
 
-        base.draw(win)
-        for bird in birds:
-            bird.draw(win)
+    for pipe in pipes:
+        pipe.draw(win)
 
-        # score
-        score_label = STAT_FONT.render("Score: " + str(score),1,(255,255,255))
-        win.blit(score_label, (WIN_WIDTH - score_label.get_width() - 15, 10))
+    base.draw(win)
+    for bird in birds:
+        bird.draw(win)
 
-        pygame.display.update()
+    # score
+    score_label = font(50).render("Score: " + str(score),1,(255,255,255))
+    win.blit(score_label, (WIN_WIDTH - score_label.get_width() - 15, 10))
 
+    pygame.display.update()
 
-    def main(genomes, config):
-        nets = []
-        ge = []
-        birds = []
-
-        # Houdt de genomes bij die de birds aanstuurt 
-        for _, g in genomes: 
-            net = neat.nn.FeedForwardNetwork.create(g, config)
-            nets.append(net)
-            birds.append(Bird(230, 350))
-            g.fitness = 0
-    
-        base = Base(FLOOR)
-        pipes = [Pipe(700)]
-        score = 0
-
-        clock = pygame.time.Clock()
-        start = False
-        lost = False
-
-        run = True
-        while run:
-            pygame.time.delay(30)
-            clock.tick(60)
-
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    run = False
-                    pygame.quit()
-                    quit()
-                    break
-
-        if event.type == pygame.KEYDOWN and not lost:
+
+def main(genomes, config):
+    win = get_window()
+    nets = []
+    ge = []
+    birds = []
+
+    # Houdt de genomes bij die de birds aanstuurt 
+    for _, g in genomes: 
+        net = neat.nn.FeedForwardNetwork.create(g, config)
+        nets.append(net)
+        birds.append(Bird(230, 350))
+        g.fitness = 0
+
+    base = Base(FLOOR)
+    pipes = [Pipe(700)]
+    score = 0
+
+    clock = pygame.time.Clock()
+    start = False
+    lost = False
+
+    run = True
+    while run:
+        pygame.time.delay(30)
+        clock.tick(60)
+
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                run = False
+                pygame.quit()
+                quit()
+                break
+
+            if event.type == pygame.KEYDOWN and not lost:
                 if event.key == pygame.K_SPACE:
                     if not start:
                         start = True
@@ -360,18 +372,18 @@ class Base:
                 for pipe in pipes:
                     pipe.move()
                     for x, bird in enumerate(birds):
-                    # check voor collision, haalt fitness af van birds als ze collision hebben
+                        # check voor collision, haalt fitness af van birds als ze collision hebben
                         if pipe.collide(bird, win):
-                        ge [x].fitness -= 1
-                        birds.pop(x)
-                        nets.pop(x)
-                        ge.pop(x)
+                            ge [x].fitness -= 1
+                            birds.pop(x)
+                            nets.pop(x)
+                            ge.pop(x)
 
                         if not pipe.passed and pipe.x < birds.x:
-                        pipe.passed = True
-                        add_pipe = True
-                        
-                 if pipe.x + pipe.PIPE_TOP.get_width() < 0:
+                            pipe.passed = True
+                            add_pipe = True
+
+                    if pipe.x + pipe.PIPE_TOP.get_width() < 0:
                         rem.append(pipe)
                 else: 
                     run = False 
@@ -389,30 +401,181 @@ class Base:
 
         # haalt birds weg als ze tegen een pipe aankomen
         for x, bird in enumerate(birds):
-                if bird.y + bird_images[0].get_height() - 10 >= FLOOR:
-                    birds.pop(x)
-                    nets.pop(x)
-                    ge.pop(x)
+            if bird.y + ASSETS.bird_images[0].get_height() - 10 >= FLOOR:
+                birds.pop(x)
+                nets.pop(x)
+                ge.pop(x)
+
+        draw_window(win, birds, pipes, base, score)
+
+    end_screen(win)
+
+
+def draw_replay(win, replay, state, birds, speed, paused):
+    """
+    # tekent een frame van een replay, net als draw_window alleen wat veranderde
+    :param win: pygame window surface
+    :param replay: flappy_replay.Replay
+    :param state: flappy_replay.ReplayState
+    :param birds: een flappy_core.Bird per vogel in de replay, voor het tekenen
+    :param speed: frames per scherm frame (float)
+    :param paused: bool
+    :return: None
+    """
+    dirty = RENDERER.begin(win)
+
+    drawn = state.pipes.draw(win)
+
+    drawn += state.base.draw(win)
+    for row in np.flatnonzero(state.birds.alive):
+        bird = birds[row]
+        bird.y = state.birds.y[row]
+        bird.tilt = state.birds.tilt[row]
+        drawn += bird.draw(win)
+
+    score_label = RENDERER.label("score", "Score: " + str(state.score))
+    drawn.append(win.blit(score_label, (WIN_WIDTH - score_label.get_width() - 15, 10)))
+
+    info = "Gen {}  frame {}/{}  alive {}  x{:g}{}".format(replay.generation, state.frame, len(replay),
+                                                           int(state.birds.alive.sum()), speed,
+                                                           "  paused" if paused else "")
+    drawn.append(win.blit(RENDERER.label("info", info, 30), (10, 10)))
 
-        draw_window(WIN, birds, pipes, base, score)
+    RENDERER.finish(dirty, drawn)
 
-    end_screen(WIN)
 
+def play_replay(path, speed=1.0, start=0):
+    """
+    # speelt een opgenomen generatie af, zie flappy_replay
+    # spatie: pauze, pijltjes links/rechts: 100 frames terug/vooruit,
+    # pijltjes omhoog/omlaag: sneller/langzamer, home: naar het begin
+    :param path: replay file (.npz)
+    :param speed: frames per scherm frame, mag een breuk zijn (float)
+    :param start: frame om te beginnen (int)
+    :return: None
+    """
+    replay = flappy_replay.Replay.load(path)
+    replay.build_keyframes()
+    state = replay.seek(start)
+    win = get_window()
+    birds = [flappy_core.Bird(230, 350) for _ in replay.keys]
+
+    clock = pygame.time.Clock()
+    paused = False
+    due = 0.0   # frames die nog afgespeeld moeten worden
 
-    # Laadt de config file in 
-    def run(config_path): 
-        config = neat.config.Config(neat.DefaultGenome, neat.DefaultReproduction, 
-                                    neat.DefaultSpeciesSet, neat.DefaultStagnation, 
-                                    config_path)
-        p = neat.Population(config)
-    
-        p.add_repoter(neat.StdOutReporter(True))
-        stats = neat.StatisticsReporter()
-        p.add_reporter(stats) 
+    while True:
+        clock.tick(60)
 
-        winner = p.run(main,50) 
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                pygame.quit()
+                return
 
-    if __name__ == "main__":
-        local_dir = os.pass.dirname(__file__)
-        config_path = os.path.join(local_dir, "config-feedforward.txt")
-        run(config_path) 
+            if event.type == pygame.KEYDOWN:
+                if event.key == pygame.K_SPACE:
+                    paused = not paused
+                elif event.key == pygame.K_RIGHT:
+                    state = replay.seek(state.frame + 100)
+                elif event.key == pygame.K_LEFT:
+                    state = replay.seek(state.frame - 100)
+                elif event.key == pygame.K_HOME:
+                    state = replay.seek(0)
+                elif event.key == pygame.K_UP:
+                    speed *= 2
+                elif event.key == pygame.K_DOWN:
+                    speed /= 2
+
+        if not paused:
+            due += speed
+            while due >= 1 and state.frame < len(replay):
+                state.step(replay)
+                due -= 1
+            if state.frame >= len(replay):
+                due = 0.0
+
+        draw_replay(win, replay, state, birds, speed, paused)
+
+
+def play_champion(path, seed=None):
+    """
+    # laat een opgeslagen winnaar spelen, zie flappy_nets.Champion en
+    # flappy_bird_neat.py --champion. Geen neat config of pickle nodig.
+    :param path: champion file (.npz)
+    :param seed: seed van de baan, None voor een willekeurige baan (int)
+    :return: score (int)
+    """
+    champion = flappy_nets.Champion.load(path)
+    print("Playing genome {} (fitness {:.1f})".format(int(champion.meta.get("genome_key", -1)),
+                                                     float(champion.meta.get("fitness", np.nan))))
+    win = get_window()
+    bird = flappy_core.Bird(230, 350)
+    base = flappy_core.Base(FLOOR)
+    heights = iter(flappy_core.Course(seed))
+    pipes = flappy_core.PipeQueue()
+    pipes.spawn(700, next(heights))
+    score = 0
+
+    clock = pygame.time.Clock()
+    while True:
+        clock.tick(60)
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                pygame.quit()
+                return score
+
+        pipe_ind = pipes.next_pipe(bird.x)
+        bird.move()
+        output = champion.activate((bird.y, abs(bird.y - int(pipes.height[pipe_ind])),
+                                    abs(bird.y - int(pipes.bottom[pipe_ind]))))
+        if output[0] > 0.5:
+            bird.jump()
+
+        base.move()
+        pipes.move()
+        if any(flappy_core.collide_pipe(*pipes.pipe(i), bird) for i in range(len(pipes))):
+            break
+        if pipes.pass_birds(bird.x):
+            score += 1
+            pipes.spawn(WIN_WIDTH, next(heights))
+        pipes.retire_gone()
+        if bird.y + bird.img.get_height() - 10 >= FLOOR or bird.y < -50:
+            break
+
+        RENDERER.draw(win, [bird], pipes, base, score, 1, pipe_ind)
+
+    print("Champion scored {}".format(score))
+    return score
+
+
+# Laadt de config file in 
+def run(config_path): 
+    config = neat.config.Config(neat.DefaultGenome, neat.DefaultReproduction, 
+                                neat.DefaultSpeciesSet, neat.DefaultStagnation, 
+                                config_path)
+    p = neat.Population(config)
+
+    p.add_reporter(neat.StdOutReporter(True))
+    stats = neat.StatisticsReporter()
+    p.add_reporter(stats) 
+
+    winner = p.run(main,50) 
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Play a replay recorded with flappy_bird_neat.py --record, "
+                                                 "without one train with this game")
+    parser.add_argument("replay", nargs="?", default=None, help="replay file (.npz)")
+    parser.add_argument("--speed", type=float, default=1.0, help="frames per screen frame")
+    parser.add_argument("--start", type=int, default=0, help="frame to start at")
+    parser.add_argument("--champion", default=None,
+                        help="instead of a replay, let the network saved by flappy_bird_neat.py play (.npz)")
+    parser.add_argument("--seed", type=int, default=None, help="course seed for --champion, random if not set")
+    args = parser.parse_args()
+
+    if args.champion:
+        play_champion(args.champion, args.seed)
+    elif args.replay:
+        play_replay(args.replay, args.speed, args.start)
+    else:
+        local_dir = os.path.dirname(__file__)
+        run(os.path.join(local_dir, "config-feedforward.txt")) 
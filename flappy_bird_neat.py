@@ -7,454 +7,615 @@ Author: Tech With Tim
 Estimated Work Time: 5 hours (1 just for that damn collision)
 """
 import pygame
-import random
 import os
-import time
+import argparse
+import multiprocessing
+import numpy as np
 import neat
-import visualize
-import pickle        #voegt bibliotheek pickle toe om winnaar op te kunnen slaan
-pygame.font.init()  # init font
-
-WIN_WIDTH = 600
-WIN_HEIGHT = 800
-FLOOR = 730
-STAT_FONT = pygame.font.SysFont("comicsans", 50)
-END_FONT = pygame.font.SysFont("comicsans", 70)
+import flappy_core
+import flappy_env
+import flappy_nets
+import flappy_checkpoint
+import flappy_profile
+import flappy_replay
+import flappy_spectate
+from flappy_core import Bird, Pipe, Base, WIN_WIDTH, WIN_HEIGHT, FLOOR, BIRD_X, collide_pipe
+
+# FLAPPY_HEADLESS=1 traint zonder venster: geen tekenen, geen events en geen framerate limiet
+HEADLESS = os.environ.get("FLAPPY_HEADLESS", "0") == "1"
 DRAW_LINES = False
 
-WIN = pygame.display.set_mode((WIN_WIDTH, WIN_HEIGHT))
-pygame.display.set_caption("Flappy Bird")
+WIN = None  # het venster wordt pas gemaakt bij het eerste tekenen, zie get_window()
 
-pipe_img = pygame.transform.scale2x(pygame.image.load(os.path.join("imgs","pipe.png")).convert_alpha())
-bg_img = pygame.transform.scale(pygame.image.load(os.path.join("imgs","bg.png")).convert_alpha(), (600, 900))
-bird_images = [pygame.transform.scale2x(pygame.image.load(os.path.join("imgs","bird" + str(x) + ".png"))) for x in range(1,4)]
-base_img = pygame.transform.scale2x(pygame.image.load(os.path.join("imgs","base.png")).convert_alpha())
+def get_window():
+    """
+    the game window, created on first use together with everything
+    that needs a display (converted images, rotation atlas)
+    :return: pygame window surface
+    """
+    global WIN
+    if WIN is None:
+        if HEADLESS:
+            os.environ.setdefault("SDL_VIDEODRIVER", "dummy")  # SDL dummy driver, moet voor set_mode
+        WIN = pygame.display.set_mode((WIN_WIDTH, WIN_HEIGHT))
+        pygame.display.set_caption("Flappy Bird")
+        flappy_core.convert_images()
+        flappy_core.build_rotation_atlas()
+    return WIN
+
+def __getattr__(name):
+    # STAT_FONT and END_FONT used to be created at import
+    if name == "STAT_FONT":
+        return flappy_core.font(50)
+    if name == "END_FONT":
+        return flappy_core.font(70)
+    raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
 
 gen = 0
-
-class Bird:
+COURSE_SEEDS = flappy_core.course_seeds()  # pipe course per generatie, zie run()
+FAST_FORWARD = False  # zie flappy_core.simulate
+BUDGET = flappy_core.Budget()  # grenzen per generatie, run() leest ze uit de config
+NET_CACHE = flappy_nets.NetworkCache()  # netwerken van ongewijzigde genomes, None bouwt ze elke keer
+CACHE_FITNESS = False  # ook de fitness van ongewijzigde genomes hergebruiken, zie run()
+MULTI_COURSE = flappy_core.MultiCourse()  # aantal courses per genome en hoe hun fitness samen gaat
+SPECTATOR = None  # flappy_spectate.SnapshotBuffer als iemand meekijkt, zie spectate()
+
+class DirtyRenderer:
     """
-    # Bird class vertegenwoordigd de flappy bird
+    draws the game for draw_window, but only sends the parts of the
+    screen that changed to the display. The background is only restored
+    under what was drawn the frame before, and the labels are only
+    rendered again when their text changes.
     """
-    MAX_ROTATION = 25
-    IMGS = bird_images
-    ROT_VEL = 20
-    ANIMATION_TIME = 5
 
-    def __init__(self, x, y):
-        """
-        Initialize the object
-        :param x: starting x pos (int)
-        :param y: starting y pos (int)
-        :return: None
+    def __init__(self):
         """
-        self.x = x
-        self.y = y
-        self.tilt = 0  # degrees to tilt
-        self.tick_count = 0
-        self.vel = 0
-        self.height = self.y
-        self.img_count = 0
-        self.img = self.IMGS[0]
-
-    def jump(self):
-        """
-        make the bird jump
+        Initialize the renderer, the first frame is drawn completely
         :return: None
         """
-        self.vel = -10.5
-        self.tick_count = 0
-        self.height = self.y
+        self.drawn = None     # rects drawn last frame, None for a full redraw
+        self.labels = {}      # name -> (text, surface)
+        self.wing = 0         # vleugel animatie van draw_snapshot, zoals Bird.img_count
 
-    def move(self):
+    def label(self, name, text, size=50):
         """
-        make the bird move 
-        :return: None
+        the rendered label, cached until its text changes
+        :param name: which label (str)
+        :param text: label text (str)
+        :param size: font size, 50 is STAT_FONT (int)
+        :return: pygame surface
         """
-        self.tick_count += 1
-
-        # for downwards acceleration 
-        displacement = self.vel*(self.tick_count) + 0.5*(3)*(self.tick_count)**2  # calculate displacement
-
-        # eindsnelheid 
-        if displacement >= 16:
-            displacement = (displacement/abs(displacement)) * 16
-
-        if displacement < 0:
-            displacement -= 2
+        cached = self.labels.get(name)
+        if cached is None or cached[0] != text:
+            cached = self.labels[name] = (text, flappy_core.font(size).render(text,1,(255,255,255)))
+        return cached[1]
 
-        self.y = self.y + displacement
-
-        if displacement < 0 or self.y < self.height + 50:  # tilt up
-            if self.tilt < self.MAX_ROTATION:
-                self.tilt = self.MAX_ROTATION
-        else:  # tilt down
-            if self.tilt > -90:
-                self.tilt -= self.ROT_VEL
-
-    def draw(self, win):
+    def begin(self, win):
         """
-        draw the bird
-        :param win: pygame window or surface
-        :return: None
+        start a frame: put the background back under what the last frame drew
+        :param win: pygame window
+        :return: list of the rects that were restored
         """
-        self.img_count += 1
-
-           # For animation of bird, loop through three images 
-        if self.img_count <= self.ANIMATION_TIME:
-            self.img = self.IMGS[0]
-        elif self.img_count <= self.ANIMATION_TIME*2:
-            self.img = self.IMGS[1]
-        elif self.img_count <= self.ANIMATION_TIME*3:
-            self.img = self.IMGS[2]
-        elif self.img_count <= self.ANIMATION_TIME*4:
-            self.img = self.IMGS[1]
-        elif self.img_count == self.ANIMATION_TIME*4 + 1:
-            self.img = self.IMGS[0]
-            self.img_count = 0
-
-        # so when bird is nose diving it isn't flapping
-        if self.tilt <= -80:
-            self.img = self.IMGS[1]
-            self.img_count = self.ANIMATION_TIME*2
-
-
-        # tilt the bird
-        blitRotateCenter(win, self.img, (self.x, self.y), self.tilt)
-
-    def get_mask(self):
+        bg_img = flappy_core.bg_img
+        if self.drawn is None:
+            win.blit(bg_img, (0,0))
+            return [win.get_rect()]
+        for rect in self.drawn:
+            win.blit(bg_img, rect, rect)
+        return self.drawn
+
+    def finish(self, dirty, drawn):
         """
-        gets the mask for the current image of the bird
+        end a frame: send the restored and the drawn rects to the display
+        :param dirty: what begin returned
+        :param drawn: rects drawn this frame
         :return: None
         """
-        return pygame.mask.from_surface(self.img)
-
-
-class Pipe():
-    """
-    represents a pipe object
-    """
-    GAP = 160           #1 GAP 160 gemaakt 
-    VEL = 5             #2 VEL 5 gemaakt 
-
-    def __init__(self, x):
-        """
-        initialize pipe object
-        :param x: int
-        :param y: int
-        :return" None
-        """
-        self.x = x
-        self.height = 0
-
-        # where the top and bottom of the pipe is
-        self.top = 0
-        self.bottom = 0
-
-        self.PIPE_TOP = pygame.transform.flip(pipe_img, False, True)
-        self.PIPE_BOTTOM = pipe_img
-
-        self.passed = False
-
-        self.set_height()
+        self.drawn = drawn
+        pygame.display.update(dirty + drawn)
 
-    def set_height(self):
+    def draw(self, win, birds, pipes, base, score, gen, pipe_ind):
         """
-        set the height of the pipe, from the top of the screen
+        draw a frame, see draw_window
         :return: None
         """
-        self.height = random.randrange(50, 450)
-        self.top = self.height - self.PIPE_TOP.get_height()
-        self.bottom = self.height + self.GAP
+        dirty = self.begin(win)
+        drawn = pipes.draw(win)
 
-    def move(self):
+        drawn += base.draw(win)
+        for bird in birds:
+            # draw lines from bird to pipe
+            if DRAW_LINES:
+                try:
+                    drawn.append(pygame.draw.line(win, (255,0,0), (bird.x+bird.img.get_width()/2, bird.y + bird.img.get_height()/2), (int(pipes.x[pipe_ind]) + Pipe.WIDTH/2, int(pipes.height[pipe_ind])), 5))
+                    drawn.append(pygame.draw.line(win, (255,0,0), (bird.x+bird.img.get_width()/2, bird.y + bird.img.get_height()/2), (int(pipes.x[pipe_ind]) + Pipe.WIDTH/2, int(pipes.bottom[pipe_ind])), 5))
+                except:
+                    pass
+            # draw bird
+            drawn += bird.draw(win)
+
+        drawn += self.draw_labels(win, score, gen, len(birds))
+        self.finish(dirty, drawn)
+
+    def draw_labels(self, win, score, gen, alive):
         """
-        move pipe based on vel
-        :return: None
+        draw the score, generation and number of living birds
+        :return: list of the changed rects
         """
-        self.x -= self.VEL
+        # score
+        score_label = self.label("score", "Score: " + str(score))
+        drawn = [win.blit(score_label, (WIN_WIDTH - score_label.get_width() - 15, 10))]
 
-    def draw(self, win):
-        """
-        draw both the top and bottom of the pipe
-        :param win: pygame window/surface
-        :return: None
-        """
-        # draw top
-        win.blit(self.PIPE_TOP, (self.x, self.top))
-        # draw bottom
-        win.blit(self.PIPE_BOTTOM, (self.x, self.bottom))
+        # generations
+        drawn.append(win.blit(self.label("gens", "Gens: " + str(gen-1)), (10, 10)))
 
+        # alive
+        drawn.append(win.blit(self.label("alive", "Alive: " + str(alive)), (10, 50)))
+        return drawn
 
-    def collide(self, bird, win):
+    def draw_snapshot(self, win, snap, base):
         """
-        returns if a point is colliding with the pipe
-        :param bird: Bird object
-        :return: Bool
+        draw a flappy_spectate.Snapshot straight from its arrays instead of
+        through Bird objects. Birds at the same spot with the same image
+        are drawn once, all birds go to the screen with one blits call and
+        one rect around them.
+        :param win: pygame window
+        :param snap: flappy_spectate.Snapshot
+        :param base: Base to draw the floor with, at the x of the snapshot
+        :return: None
         """
-        bird_mask = bird.get_mask()
-        top_mask = pygame.mask.from_surface(self.PIPE_TOP)
-        bottom_mask = pygame.mask.from_surface(self.PIPE_BOTTOM)
-        top_offset = (self.x - bird.x, self.top - round(bird.y))
-        bottom_offset = (self.x - bird.x, self.bottom - round(bird.y))
-
-        b_point = bird_mask.overlap(bottom_mask, bottom_offset)
-        t_point = bird_mask.overlap(top_mask,top_offset)
-
-        if b_point or t_point:
-            return True
-
-        return False
-
-class Base:
+        dirty = self.begin(win)
+        pipes = snap.pipes
+        drawn = pipes.draw(win)
+        drawn += base.draw(win)
+
+        # de vleugels klappen voor alle vogels tegelijk, zoals bij Bird objecten die samen begonnen
+        self.wing = self.wing % (Bird.ANIMATION_TIME*4) + 1
+        wing_img = Bird.IMGS[(0, 1, 2, 1)[(self.wing - 1) // Bird.ANIMATION_TIME]]
+        count = snap.birds
+        spots = np.unique(np.column_stack((snap.bird_y[:count], snap.bird_tilt[:count])), axis=0)
+        sprites = []
+        for y, tilt in spots.tolist():
+            img = Bird.IMGS[1] if tilt <= -80 else wing_img   # bij een duikvlucht niet klappen
+            rotated_image, (dx, dy) = flappy_core.rotated_sprite(img, tilt)
+            left, top = img.get_rect(topleft = (BIRD_X, y)).topleft
+            sprites.append((rotated_image, (left + dx, top + dy)))
+            if DRAW_LINES:
+                center = (BIRD_X + img.get_width()/2, y + img.get_height()/2)
+                pipe_x = int(pipes.x[snap.pipe_ind]) + Pipe.WIDTH/2
+                drawn.append(pygame.draw.line(win, (255,0,0), center, (pipe_x, int(pipes.height[snap.pipe_ind])), 5))
+                drawn.append(pygame.draw.line(win, (255,0,0), center, (pipe_x, int(pipes.bottom[snap.pipe_ind])), 5))
+        if sprites:
+            rects = win.blits(sprites)
+            drawn.append(rects[0].unionall(rects[1:]))
+
+        drawn += self.draw_labels(win, snap.score, max(snap.generation, 1), count)
+        self.finish(dirty, drawn)
+
+RENDERER = DirtyRenderer()
+
+def draw_window(win, birds, pipes, base, score, gen, pipe_ind):
     """
-    Represnts the moving floor of the game
+    draws the windows for the main game loop, only the changed parts
+    of the screen are updated (see DirtyRenderer)
+    :param win: pygame window surface
+    :param bird: a Bird object
+    :param pipes: flappy_core.PipeQueue
+    :param score: score of the game (int)
+    :param gen: current generation
+    :param pipe_ind: index of closest pipe
     """
-    VEL = 5                  
-    WIDTH = base_img.get_width()
-    IMG = base_img
-
-    def __init__(self, y):
-        """
-        Initialize the object
-        :param y: int
-        :return: None
-        """
-        self.y = y
-        self.x1 = 0
-        self.x2 = self.WIDTH
+    if gen == 0:
+        gen = 1
+    RENDERER.draw(win, birds, pipes, base, score, gen, pipe_ind)
 
-    def move(self):
-        """
-        move floor so it looks like its scrolling
-        :return: None
-        """
-        self.x1 -= self.VEL
-        self.x2 -= self.VEL
-        if self.x1 + self.WIDTH < 0:
-            self.x1 = self.x2 + self.WIDTH
-
-        if self.x2 + self.WIDTH < 0:
-            self.x2 = self.x1 + self.WIDTH
-
-    def draw(self, win):
-        """
-        Draw the floor. This is two images that move together.
-        :param win: the pygame surface/window
-        :return: None
-        """
-        win.blit(self.IMG, (self.x1, self.y))
-        win.blit(self.IMG, (self.x2, self.y))
-
-
-    def blitRotateCenter(surf, image, topleft, angle):
-       """
-       Rotate a surface and blit it to the window
-       :param surf: the surface to blit to
-       :param image: the image surface to rotate
-       :param topLeft: the top left position of the image
-       :param angle: a float value for angle
-       :return: None
-       """
-       rotated_image = pygame.transform.rotate(image, angle)
-       new_rect = rotated_image.get_rect(center = image.get_rect(topleft = topleft).center)
-
-       surf.blit(rotated_image, new_rect.topleft)
-
-    def draw_window(win, birds, pipes, base, score, gen, pipe_ind):
-       """
-       draws the windows for the main game loop
-       :param win: pygame window surface
-       :param bird: a Bird object
-       :param pipes: List of pipes
-       :param score: score of the game (int)    	    	                
-       :param gen: current generation
-       :param pipe_ind: index of closest pipe
-       """
-       if gen == 0:
-         gen = 1
-         win.blit(bg_img, (0,0))
-
-       for pipe in pipes:
-         pipe.draw(win)
-
-       base.draw(win)
-       for bird in birds:
-          # draw lines from bird to pipe
-          if DRAW_LINES:
-              try:
-                  pygame.draw.line(win, (255,0,0), (bird.x+bird.img.get_width()/2, bird.y + bird.img.get_height()/2), (pipes[pipe_ind].x + pipes[pipe_ind].PIPE_TOP.get_width()/2, pipes[pipe_ind].height), 5)
-                  pygame.draw.line(win, (255,0,0), (bird.x+bird.img.get_width()/2, bird.y + bird.img.get_height()/2), (pipes[pipe_ind].x + pipes[pipe_ind].PIPE_BOTTOM.get_width()/2, pipes[pipe_ind].bottom), 5)
-              except:
-                 pass
-       # draw bird
-       bird.draw(win)
-
-       # score
-       score_label = STAT_FONT.render("Score: " + str(score),1,(255,255,255))
-       win.blit(score_label, (WIN_WIDTH - score_label.get_width() - 15, 10))
-    
-       # generations
-       score_label = STAT_FONT.render("Gens: " + str(gen-1),1,(255,255,255))
-       win.blit(score_label, (10, 10))
-    
-       # alive
-       score_label = STAT_FONT.render("Alive: " + str(len(birds)),1,(255,255,255))
-       win.blit(score_label, (10, 50))
-
-    pygame.display.update()
-
-   #3 veranderingen voor de fitness functie  
-   def eval_genomes(genomes, config)
-     """
-     runs the simulation of the current population of
-     birds and sets their fitness based on the distance they
-     reach in the game.
-     """
-     global WIN, gen 
-     win = WIN
-     gen += 1
-    
-     # start by creating lists holding the genome itself, the
-     # neural network associated with the genome and the
-     # bird object that uses that network to play
-     nets = []
-     birds = []
-     ge = []
-      
-# for genome_id, genome in genomes:
+def spectate(train, fps=60):
+    """
+    runs train on this process at full speed while a window process
+    (see spectator_window) shows the newest snapshot in SPECTATOR at a
+    fixed frame rate, dropping the frames in between. Closing the window
+    only stops the watching.
+    :param train: function without arguments that trains
+    :param fps: frames drawn per second (int)
+    :return: what train returns
+    """
+    window = multiprocessing.Process(target=spectator_window, name="spectator", daemon=True,
+                                     args=(SPECTATOR.name, SPECTATOR.capacity, SPECTATOR.lock, fps))
+    window.start()
+    try:
+        return train()
+    finally:
+        SPECTATOR.stop()
+        window.join()
+        print(SPECTATOR.stats())
+
+def spectator_window(name, capacity, lock, fps):
+    """
+    the window process of spectate: draws the newest snapshot of the
+    buffer until the training stops or the window is closed
+    :param name: name of the flappy_spectate.SnapshotBuffer
+    :param capacity: its capacity (int)
+    :param lock: its lock
+    :param fps: frames drawn per second (int)
+    :return: None
+    """
+    buffer = flappy_spectate.SnapshotBuffer.attach(name, capacity, lock)
+    win = get_window()
+    clock = pygame.time.Clock()
+    base = Base(FLOOR)
+    while not buffer.stopped():
+        clock.tick(fps)
+        if any(event.type == pygame.QUIT for event in pygame.event.get()):
+            break
+
+        snap = buffer.take()
+        if snap is not None:
+            base.x1, base.x2 = snap.base_x
+            RENDERER.draw_snapshot(win, snap, base)
+    buffer.close()
+    pygame.display.quit()
+
+#3 veranderingen voor de fitness functie
+def eval_genomes(genomes, config):
+    """
+    runs the simulation of the current population of
+    birds and sets their fitness based on the distance they
+    reach in the game.
+    """
+    global gen
+    lockstep = not HEADLESS and SPECTATOR is None  # tekenen in de loop zelf, met framerate limiet
+    win = get_window() if lockstep else None
+    gen += 1
+    spectating = SPECTATOR is not None
+    if spectating:
+        SPECTATOR.start_generation(gen)
+    Pipe.pixel_tests = 0
+    Pipe.pixel_tests_skipped = 0
+    prof = flappy_profile.PROFILER
+    profiling = prof.enabled
+    if profiling:
+        prof.start_generation(gen)
+
+    # start by creating lists holding the genome itself, the
+    # neural network associated with the genome and the
+    # bird object that uses that network to play
+    nets = []
+    birds = []
+    ge = []
+
+    for genome_id, genome in genomes:
         genome.fitness = 0                          #4 start met een fitness van 0
-        net = neat.nn.FeedForwardNetwork.create(genome, config)
+        if NET_CACHE is not None:
+            net = NET_CACHE.network(genome, config)
+        else:
+            net = neat.nn.FeedForwardNetwork.create(genome, config)
         nets.append(net)
         birds.append(Bird(230,350))
         ge.append(genome)
 
-#4 de fitness van elke vogel wordt bekeken, hier zit de pickel maar die hebben we niet kunnen trainen vanwege en error 
-   with open('best.pickle', 'rb') as handle:
-        net=pickle.load(handle)
-    nets.append(net)
-    birds.append(Bird(230,350))
-    
-
+    course_seed = next(COURSE_SEEDS)
+    heights = iter(flappy_core.Course(course_seed))
     base = Base(FLOOR)
-    pipes = [Pipe(700)]
+
+    rec = flappy_replay.RECORDER
+    recording = rec.enabled
+    if recording:
+        rec.start_generation(gen, course_seed, [genome.key for genome in ge])
+    pipes = flappy_core.PipeQueue()   # ring buffer, geen lijst met Pipe objecten meer
+    pipes.spawn(700, next(heights))
     score = 0
+    frames = 0
+    BUDGET.start()
 
     clock = pygame.time.Clock()
 
     run = True
     while run and len(birds) > 0:
-        clock.tick(100)                            #5 framerate 100 gemaakt i.p.v 60
-
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                run = False
-                pygame.quit()
-                quit()                              #6 zorgt ervoor dat niet alleen "loop" stopt maar spel stopt
-                break
+        frames += 1
+        if profiling:
+            prof.start_frame()
+        if lockstep:                               # headless: geen framerate limiet en geen events
+            clock.tick(100)                        #5 framerate 100 gemaakt i.p.v 60
+
+            for event in pygame.event.get():
+                if event.type == pygame.QUIT:
+                    run = False
+                    pygame.quit()
+                    quit()                          #6 zorgt ervoor dat niet alleen "loop" stopt maar spel stopt
+                    break
 
-        pipe_ind = 0
         if len(birds) > 0:
-            if len(pipes) > 1 and birds[0].x > pipes[0].x + pipes[0].PIPE_TOP.get_width(): 
-                pipe_ind = 1     #5 deze code zorgt ervoor dat wanneer het vogeltje de pijp voorbij vliegt dat dan de volgende pijp in frame komt
-        else: 
-            run: False
-            break 
+            pipe_ind = pipes.next_pipe(birds[0].x)     #5 deze code zorgt ervoor dat wanneer het vogeltje de pijp voorbij vliegt dat dan de volgende pijp in frame komt
+            gap_top, gap_bottom = int(pipes.height[pipe_ind]), int(pipes.bottom[pipe_ind])
+        else:
+            run = False
+            break
                                                     #7 deze "else" zorgt ervoor dat als er geen vogeltjes zijn het spel stopt
+        if profiling:
+            prof.lap("events")
 
-        
         for x, bird in enumerate(birds):            #8 geeft vogeltje 0.1 fitness omdat het weer een frame verder is
             bird.move()
             ge[x].fitness += 0.1
- 
-            output = nets[birds.index(bird)].activate((bird.y, abs(bird.y - pipes[pipe_ind].height), abs(bird.y - pipes[pipe_ind].bottom)))
+            if profiling:
+                prof.lap("move")
 
-            if output[0] > 0.5:  
-                bird.jump()    
+            output = nets[birds.index(bird)].activate((bird.y, abs(bird.y - gap_top), abs(bird.y - gap_bottom)))
+
+            if output[0] > 0.5:
+                bird.jump()
+            if recording:
+                rec.step(ge[x].key, output[0] > 0.5)
+            if profiling:
+                prof.lap("activate")
         #9 De output stuurt info naar neurale netwerk; als waarde boven 0.5 is dan moet vogeltje springen
 
-        
+
         base.move()
 
-        rem = []
-        add_pipe = False
-        for pipe in pipes:
-            pipe.move()
+        pipes.move()
+        for i in range(len(pipes)):
+            pipe_x, top, bottom = pipes.pipe(i)
             #10 check voor collision, haalt fitness af van birds als ze collision hebben
             for bird in birds:
-                if pipe.collide(bird, win):
+                if collide_pipe(pipe_x, top, bottom, bird):
                     ge[birds.index(bird)].fitness -= 1
                     nets.pop(birds.index(bird))
                     ge.pop(birds.index(bird))
                     birds.pop(birds.index(bird))
+        if profiling:
+            prof.lap("pipes")
 
-            if pipe.x + pipe.PIPE_TOP.get_width() < 0:
-                rem.append(pipe)
-
-            if not pipe.passed and pipe.x < bird.x:
-                pipe.passed = True
-                add_pipe = True
-
-        if add_pipe:
+        if pipes.pass_birds(bird.x):
             score += 1
-           #11 wanneer een bird door een pipe komt krijgt hij 5 fitness
+            #11 wanneer een bird door een pipe komt krijgt hij 5 fitness
             for genome in ge:
                 genome.fitness += 5
-            pipes.append(Pipe(WIN_WIDTH))
+            pipes.spawn(WIN_WIDTH, next(heights))
+        pipes.retire_gone()
 
-        for r in rem:
-            pipes.remove(r)
 
-        
         for bird in birds:
             if bird.y + bird.img.get_height() - 10 >= FLOOR or bird.y < -50:    #12 zorgt ervoor dat vogeltje niet over pijpen heen kan vliegen
                 nets.pop(birds.index(bird))
                 ge.pop(birds.index(bird))
                 birds.pop(birds.index(bird))
-
-        draw_window(WIN, birds, pipes, base, score, gen, pipe_ind)     #13 laat score, hoeveelheid vogels, en gen zien
-
-                                                                       #14 eindig loop na score van 25
-        if score > 25:  
-           pickle.dump(nets[0],open("best.pickle", "wb"))    #15 kiest "winner" voor pickle
+        if profiling:
+            prof.lap("bookkeeping")
+
+        if lockstep:
+            draw_window(win, birds, pipes, base, score, gen, pipe_ind)     #13 laat score, hoeveelheid vogels, en gen zien
+        elif spectating and SPECTATOR.wants():
+            SPECTATOR.publish([bird.y for bird in birds], [bird.tilt for bird in birds], pipes, pipe_ind,
+                              (base.x1, base.x2), score)
+        if profiling:
+            prof.lap("draw")
+            prof.end_frame(len(birds))
+
+                                                                       #14 eindig loop na score van 25 of een andere grens
+        best = max(genome.fitness for genome in ge) if BUDGET.fitness_cap and ge else 0.0
+        if BUDGET.check(frames, score, best):
             break           #16 stopt de loop
-                            #17 with open('winner.pickle', 'wb') as f: (pickle poging)
-                            #18 pickle.dump(winner,f)                  (pickle poging)
-
-
-                            #19 Laadt de config file in 
-  def run(config_path):
-      """
-      runs the NEAT algorithm to train a neural network to play flappy bird.
-      :param config_file: location of config file
-      :return: None
-      """
-      config = neat.config.Config(neat.DefaultGenome, neat.DefaultReproduction,
-                         neat.DefaultSpeciesSet, neat.DefaultStagnation,
-                         config_path)    # config instellen
-
-      #20 populatie creëren
-      p = neat.Population(config)
 
-      # Add a stdout reporter to show progress in the terminal.
-      p.add_reporter(neat.StdOutReporter(True))
-      stats = neat.StatisticsReporter()
-      p.add_reporter(stats)
-      #p.add_reporter(neat.Checkpointer(5))
-
-      #21 25 generaties runnen
-      winner = p.run(eval_genomes, 25)   #22 maakt van vogeltje dat fitness threshold heeft behaald de "winnaar"
-    
-      #23 score laten zien
-      print('\nBest genome:\n{!s}'.format(winner))
-
-
-    if __name__ == '__main__':
-     # Determine path to configuration file. This path manipulation is
-     # here so that the script will run successfully regardless of the
-     # current working directory.   
-      local_dir = os.path.dirname(__file__)     
-      config_path = os.path.join(local_dir, 'config-feedforward.txt')    
-      run(config_path)
+    for genome_id, genome in genomes:
+        genome.fitness = float(BUDGET.clip(genome.fitness))
+    if BUDGET.fired:
+        print("Generation stopped by the {} limit".format(BUDGET.fired))
+    print("Pixel collision tests: {} run, {} skipped by broad phase".format(Pipe.pixel_tests, Pipe.pixel_tests_skipped))
+    if NET_CACHE is not None:
+        print(NET_CACHE.stats())
+    if profiling:
+        prof.end_generation()
+    if recording:
+        print("Saved replay {}".format(rec.end_generation()))
 
 
+def eval_genomes_vectorized(genomes, config):
+    """
+    runs the same game as eval_genomes with flappy_core.simulate, all
+    birds and networks at once instead of one Bird object per genome.
+    Always headless, and slower than eval_genomes for small populations
+    such as the default pop_size of 20. With MULTI_COURSE every genome plays several courses
+    in the same batch, see flappy_env.evaluate_courses. With CACHE_FITNESS genomes that already played this
+    course keep their fitness and only the others play.
+    """
+    global gen
+    gen += 1
+
+    ge = [genome for genome_id, genome in genomes]
+    course_seed = next(COURSE_SEEDS)
+    if CACHE_FITNESS:
+        for genome in ge:
+            genome.fitness = NET_CACHE.fitness(genome, course_seed)
+        reused = len(ge)
+        ge = [genome for genome in ge if genome.fitness is None]
+        print("Fitness cache: {} genomes kept their fitness".format(reused - len(ge)))
+    if not ge:
+        return
+
+    prof = flappy_profile.PROFILER
+    if prof.enabled:
+        prof.start_generation(gen)
+    if SPECTATOR is not None:
+        SPECTATOR.start_generation(gen)
+    fitness = flappy_env.evaluate_courses(ge, config, course_seed, MULTI_COURSE, prof if prof.enabled else None,
+                                          FAST_FORWARD, BUDGET, NET_CACHE, SPECTATOR)
+    if prof.enabled:
+        prof.end_generation()
+    if BUDGET.fired:
+        print("Generation stopped by the {} limit".format(BUDGET.fired))
+    if NET_CACHE is not None:
+        print(NET_CACHE.stats())
+
+    for genome, f in zip(ge, fitness):
+        genome.fitness = float(f)
+        if CACHE_FITNESS and BUDGET.independent():
+            NET_CACHE.store_fitness(genome, course_seed, genome.fitness)
+
+
+#19 Laadt de config file in
+def run(config_path, headless=None, vectorized=False, workers=0, seed=None, fixed_course=False,
+        profile=False, profile_dump=None, fast_forward=False, checkpoint_every=5, checkpoint_minutes=None,
+        checkpoint_dir="checkpoints", keep_checkpoints=3, resume=None, record=None, champion_path="best.npz",
+        cache_size=1000, cache_fitness=False, courses=None, reducer=None, quantile=None, spectate_fps=0):
+    """
+    runs the NEAT algorithm to train a neural network to play flappy bird.
+    :param config_file: location of config file
+    :param headless: train without drawing or frame limit (bool), None uses FLAPPY_HEADLESS
+    :param vectorized: use eval_genomes_vectorized, always headless. Only faster than eval_genomes
+        from about a thousand birds, see flappy_core.simulate (bool)
+    :param workers: evaluate over this many processes with flappy_core.ParallelEvaluator, 0 for none (int)
+    :param seed: seed for the pipe courses, None for random courses (int)
+    :param fixed_course: play the same pipe course every generation (bool)
+    :param profile: print a per-generation timing breakdown, see flappy_profile (bool)
+    :param profile_dump: .csv or .json file for the per-frame timings (str)
+    :param fast_forward: only update pipes and bounds in frames where something can happen, implies vectorized (bool)
+    :param checkpoint_every: generations between checkpoints, None for no limit (int)
+    :param checkpoint_minutes: minutes between checkpoints, None for no limit (float)
+    :param checkpoint_dir: folder for the checkpoints, None for no checkpoints (str)
+    :param keep_checkpoints: number of checkpoints to keep, 0 keeps all (int)
+    :param resume: checkpoint file to continue from, "latest" for the newest in checkpoint_dir (str)
+    :param record: folder to save a replay of every generation in, see flappy_replay (str)
+    :param champion_path: .npz file to save the network of the winner in (str)
+    :param cache_size: networks of unchanged genomes to keep, see flappy_nets.NetworkCache, 0 for none (int)
+    :param cache_fitness: reuse the fitness of unchanged genomes, only pays off with fixed_course
+        and does not work for eval_genomes, implies vectorized (bool)
+    :param courses: courses per genome per generation, None for the config value,
+        more than one implies vectorized (int)
+    :param reducer: mean, min or quantile of the fitness over the courses, None for the config value (str)
+    :param quantile: quantile for the quantile reducer, None for the config value (float)
+    :param spectate_fps: train at full speed and show snapshots of the games in a window at this
+        frame rate, see spectate(). Not with workers or more than one course. 0 for off (int)
+    :return: None
+    """
+    global HEADLESS, COURSE_SEEDS, FAST_FORWARD, BUDGET, NET_CACHE, CACHE_FITNESS, MULTI_COURSE, SPECTATOR, gen
+    if headless is not None:
+        HEADLESS = headless
+    FAST_FORWARD = fast_forward
+    BUDGET = flappy_core.Budget.from_config(config_path)
+    NET_CACHE = flappy_nets.NetworkCache(cache_size) if cache_size else None
+    CACHE_FITNESS = cache_fitness and NET_CACHE is not None
+    multi = flappy_core.MultiCourse.from_config(config_path)
+    MULTI_COURSE = flappy_core.MultiCourse(courses if courses is not None else multi.courses,
+                                           reducer if reducer is not None else multi.reducer,
+                                           quantile if quantile is not None else multi.quantile)
+    vectorized = vectorized or fast_forward or CACHE_FITNESS or MULTI_COURSE.courses > 1
+    if spectate_fps and (workers or MULTI_COURSE.courses > 1):
+        print("Spectating needs one course in this process, training without it")
+        spectate_fps = 0
+    flappy_profile.PROFILER = flappy_profile.FrameProfiler(profile or profile_dump is not None, profile_dump)
+    if record and (vectorized or workers):
+        print("Recording replays needs the object loop, not --vectorized or --workers, "
+              "training without recording")
+        record = None
+    flappy_replay.RECORDER = flappy_replay.ReplayRecorder(record)
+
+    config = neat.config.Config(neat.DefaultGenome, neat.DefaultReproduction,
+                         neat.DefaultSpeciesSet, neat.DefaultStagnation,
+                         config_path)    # config instellen
+    SPECTATOR = flappy_spectate.SnapshotBuffer(config.pop_size) if spectate_fps else None
+
+    #20 populatie creëren, of verder gaan vanaf een checkpoint
+    if resume == "latest":
+        resume = flappy_checkpoint.latest_checkpoint(checkpoint_dir)
+        if resume is None:
+            print("No checkpoint in {}, starting a new run".format(checkpoint_dir))
+    if resume:
+        p = flappy_checkpoint.restore_checkpoint(resume)
+        print("Resuming from {} at generation {}".format(resume, p.generation))
+    else:
+        p = neat.Population(config)
+    gen = p.generation
+    COURSE_SEEDS = flappy_core.course_seeds(seed, fixed_course, p.generation)
+
+    # Add a stdout reporter to show progress in the terminal.
+    p.add_reporter(neat.StdOutReporter(True))
+    stats = neat.StatisticsReporter()
+    p.add_reporter(stats)
+    checkpointer = None
+    if checkpoint_dir and (checkpoint_every or checkpoint_minutes):
+        checkpointer = flappy_checkpoint.Checkpointer(
+            checkpoint_every, checkpoint_minutes * 60 if checkpoint_minutes else None,
+            checkpoint_dir, keep_checkpoints)
+        p.add_reporter(checkpointer)
+
+    eval_function = eval_genomes_vectorized if vectorized else eval_genomes
+    evaluator = None
+    if workers:
+        evaluator = flappy_core.ParallelEvaluator(workers, seed=seed, fixed_course=fixed_course,
+                                                  fast_forward=fast_forward, budget=BUDGET,
+                                                  start_generation=p.generation,
+                                                  cache=NET_CACHE if CACHE_FITNESS else None, multi=MULTI_COURSE,
+                                                  play=flappy_env.evaluate_courses)
+        eval_function = evaluator.evaluate
+
+    #21 25 generaties runnen, na een checkpoint alleen de rest
+    try:
+        if SPECTATOR is not None:
+            winner = spectate(lambda: p.run(eval_function, max(25 - p.generation, 1)), spectate_fps)
+        else:
+            winner = p.run(eval_function, max(25 - p.generation, 1))   #22 maakt van vogeltje dat fitness threshold heeft behaald de "winnaar"
+    finally:
+        if evaluator is not None:
+            evaluator.close()
+        if checkpointer is not None:
+            checkpointer.close()
+        if SPECTATOR is not None:
+            SPECTATOR.close()
+
+    #23 score laten zien en de winnaar opslaan, zie flappy_nets.Champion
+    print('\nBest genome:\n{!s}'.format(winner))
+    flappy_nets.Champion.create(winner, config).save(champion_path)
+    print("Saved champion to {}".format(champion_path))
+
+
+if __name__ == '__main__':
+    # Determine path to configuration file. This path manipulation is
+    # here so that the script will run successfully regardless of the
+    # current working directory.
+    local_dir = os.path.dirname(__file__)
+    config_path = os.path.join(local_dir, 'config-feedforward.txt')
+
+    parser = argparse.ArgumentParser(description="Train flappy bird with NEAT")
+    parser.add_argument("--headless", action="store_true", help="train without window, drawing or frame limit")
+    parser.add_argument("--vectorized", action="store_true", help="simulate the whole population with NumPy, only faster than the default "
+                             "loop from about 1000 birds (pop_size)")
+    parser.add_argument("--workers", type=int, default=0, help="number of worker processes, 0 to train in this process")
+    parser.add_argument("--seed", type=int, default=None, help="seed for the pipe courses")
+    parser.add_argument("--fixed-course", action="store_true", help="play the same pipe course every generation")
+    parser.add_argument("--profile", action="store_true", help="print a timing breakdown per generation")
+    parser.add_argument("--profile-dump", default=None, help="write per-frame timings to this .csv or .json file")
+    parser.add_argument("--fast-forward", action="store_true",
+                        help="skip pipe and bounds work in frames where nothing can happen, implies --vectorized")
+    parser.add_argument("--checkpoint-every", type=int, default=5, help="generations between checkpoints, 0 for none")
+    parser.add_argument("--checkpoint-minutes", type=float, default=None, help="minutes between checkpoints")
+    parser.add_argument("--checkpoint-dir", default=os.path.join(local_dir, "checkpoints"),
+                        help="folder for the checkpoints")
+    parser.add_argument("--keep-checkpoints", type=int, default=3, help="number of checkpoints to keep, 0 keeps all")
+    parser.add_argument("--resume", nargs="?", const="latest", default=None,
+                        help="continue from a checkpoint file, or the newest in --checkpoint-dir")
+    parser.add_argument("--champion", default=os.path.join(local_dir, "best.npz"),
+                        help="save the network of the winner to this .npz file")
+    parser.add_argument("--record", default=None,
+                        help="save a replay of every generation in this folder (not with --vectorized or --workers)")
+    parser.add_argument("--net-cache", type=int, default=1000,
+                        help="networks of unchanged genomes to keep between generations, 0 for none")
+    parser.add_argument("--cache-fitness", action="store_true",
+                        help="unchanged genomes keep their fitness on a course they played, use with --fixed-course")
+    parser.add_argument("--courses", type=int, default=None,
+                        help="courses per genome per generation, played as one batch (default from the config)")
+    parser.add_argument("--reducer", choices=flappy_core.MultiCourse.REDUCERS, default=None,
+                        help="how the fitness over the courses becomes one (default from the config)")
+    parser.add_argument("--quantile", type=float, default=None, help="quantile for --reducer quantile")
+    parser.add_argument("--spectate", nargs="?", type=int, const=60, default=0, metavar="FPS",
+                        help="train at full speed and watch snapshots of the games at FPS, default 60 "
+                             "(not with --workers or --courses)")
+    args = parser.parse_args()
+
+    run(config_path, headless=args.headless or None, vectorized=args.vectorized, workers=args.workers,
+        seed=args.seed, fixed_course=args.fixed_course, profile=args.profile, profile_dump=args.profile_dump,
+        fast_forward=args.fast_forward, checkpoint_every=args.checkpoint_every or None,
+        checkpoint_minutes=args.checkpoint_minutes, checkpoint_dir=args.checkpoint_dir,
+        keep_checkpoints=args.keep_checkpoints, resume=args.resume, record=args.record,
+        champion_path=args.champion, cache_size=args.net_cache, cache_fitness=args.cache_fitness,
+        courses=args.courses, reducer=args.reducer, quantile=args.quantile, spectate_fps=args.spectate)
@@ -0,0 +1,204 @@
+"""
+Checkpoints of a training run, so a run that gets killed can be resumed.
+Works like neat.Checkpointer (same file contents, same interval rules),
+but the state is only pickled on the training thread; compressing and
+writing happens on a background thread. Files are written under a
+temporary name and renamed when complete, so a checkpoint on disk is
+never half written, and only the newest few are kept.
+"""
+import gzip
+import os
+import pickle
+import queue
+import random
+import re
+import threading
+import time
+import neat
+
+PREFIX = "flappy-checkpoint-"
+
+
+class Checkpointer(neat.reporting.BaseReporter):
+    """
+    reporter that saves the population, species, random state and
+    generation counter every generation_interval generations or
+    time_interval_seconds, whichever comes first
+    """
+
+    def __init__(self, generation_interval=5, time_interval_seconds=None, directory="checkpoints",
+                 keep=3, prefix=PREFIX):
+        """
+        Initialize the checkpointer and start its writer thread
+        :param generation_interval: generations between checkpoints, None for no limit (int)
+        :param time_interval_seconds: seconds between checkpoints, None for no limit (float)
+        :param directory: folder for the checkpoints (str)
+        :param keep: number of checkpoints to keep, 0 keeps all (int)
+        :param prefix: start of the file names, the generation follows (str)
+        :return: None
+        """
+        self.generation_interval = generation_interval
+        self.time_interval_seconds = time_interval_seconds
+        self.directory = directory
+        self.keep = keep
+        self.prefix = prefix
+
+        self.current_generation = None
+        self.last_generation_checkpoint = None
+        self.last_time_checkpoint = time.time()
+
+        self.queue = queue.Queue()
+        self.thread = threading.Thread(target=self.writer, name="checkpoint-writer", daemon=True)
+        self.thread.start()
+
+    def __getstate__(self):
+        # de species set bewaart de reporters en wordt mee gepickled, de thread kan dat niet
+        state = dict(self.__dict__)
+        del state["queue"], state["thread"]
+        return state
+
+    def start_generation(self, generation):
+        self.current_generation = generation
+        if self.last_generation_checkpoint is None:
+            # na --resume telt het interval vanaf de generatie waar we verder gaan
+            self.last_generation_checkpoint = generation
+
+    def end_generation(self, config, population, species_set):
+        """
+        population and species_set already belong to the next generation,
+        so a checkpoint numbered N resumes at the start of generation N
+        """
+        next_generation = self.current_generation + 1
+        due = False
+        if self.time_interval_seconds is not None:
+            due = time.time() - self.last_time_checkpoint >= self.time_interval_seconds
+        if not due and self.generation_interval is not None:
+            due = next_generation - self.last_generation_checkpoint >= self.generation_interval
+
+        if due:
+            self.save_checkpoint(config, population, species_set, next_generation)
+            self.last_generation_checkpoint = next_generation
+            self.last_time_checkpoint = time.time()
+
+    def save_checkpoint(self, config, population, species_set, generation):
+        """
+        pickle the state now, before the next generation changes it, and
+        leave compressing and writing to the writer thread
+        :return: None
+        """
+        data = pickle.dumps((generation, config, population, species_set, random.getstate()),
+                            protocol=pickle.HIGHEST_PROTOCOL)
+        self.queue.put((generation, data))
+
+    def path(self, generation):
+        """
+        file name of the checkpoint of a generation
+        :param generation: int
+        :return: str
+        """
+        return os.path.join(self.directory, "{}{}".format(self.prefix, generation))
+
+    def writer(self):
+        """
+        writer thread: compresses and writes the checkpoints in order
+        :return: None
+        """
+        while True:
+            item = self.queue.get()
+            if item is None:
+                self.queue.task_done()
+                return
+            generation, data = item
+            try:
+                self.write(generation, data)
+            except OSError as e:
+                print("Could not save checkpoint {}: {}".format(self.path(generation), e))
+            finally:
+                self.queue.task_done()
+
+    def write(self, generation, data):
+        """
+        write one checkpoint atomically and remove the ones that fell out of
+        the retention window
+        :param generation: int
+        :param data: pickled state (bytes)
+        :return: None
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.path(generation)
+        temp = path + ".tmp"
+        with open(temp, "wb") as raw:
+            with gzip.GzipFile(fileobj=raw, mode="wb", compresslevel=5) as f:
+                f.write(data)
+            raw.flush()
+            os.fsync(raw.fileno())
+        os.replace(temp, path)  # pas nu is het bestand zichtbaar, nooit half geschreven
+        print("Saved checkpoint {}".format(path))
+
+        if self.keep:
+            for old in checkpoints(self.directory, self.prefix)[:-self.keep]:
+                os.remove(old)
+
+    def flush(self):
+        """
+        wait until every checkpoint so far is on disk
+        :return: None
+        """
+        self.queue.join()
+
+    def close(self):
+        """
+        write the remaining checkpoints and stop the writer thread
+        :return: None
+        """
+        self.queue.put(None)
+        self.thread.join()
+
+
+def checkpoints(directory="checkpoints", prefix=PREFIX):
+    """
+    the complete checkpoints in a folder, oldest generation first
+    :param directory: folder of the checkpoints (str)
+    :param prefix: start of the file names (str)
+    :return: list of paths
+    """
+    if not os.path.isdir(directory):
+        return []
+    pattern = re.compile(re.escape(prefix) + r"(\d+)$")
+    found = []
+    for name in os.listdir(directory):
+        match = pattern.match(name)
+        if match:
+            found.append((int(match.group(1)), os.path.join(directory, name)))
+    return [path for generation, path in sorted(found)]
+
+
+def latest_checkpoint(directory="checkpoints", prefix=PREFIX):
+    """
+    the newest checkpoint in a folder
+    :param directory: folder of the checkpoints (str)
+    :param prefix: start of the file names (str)
+    :return: path, None if there is none
+    """
+    found = checkpoints(directory, prefix)
+    return found[-1] if found else None
+
+
+def restore_checkpoint(path):
+    """
+    continue a run from a checkpoint, also restores the random state and
+    the innovation numbers, like neat.Checkpointer.restore_checkpoint
+    :param path: checkpoint file (str)
+    :return: neat.Population
+    """
+    with gzip.open(path) as f:
+        generation, config, population, species_set, state = pickle.load(f)
+    random.setstate(state)
+    # de innovation tracker zit in de gepickelde config, Population begint met een nieuwe op 0
+    tracker = getattr(config.genome_config, "innovation_tracker", None)
+    p = neat.Population(config, (population, species_set, generation))
+    if tracker is not None:
+        p.reproduction.innovation_tracker = tracker
+        config.genome_config.innovation_tracker = tracker
+    p.species.reporters = p.reporters  # niet de reporters van de vorige run
+    return p
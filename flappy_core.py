@@ -0,0 +1,1073 @@
+"""
+Display-free core of the flappy bird game: the images, the Bird, Pipe
+and Base objects and a headless simulation of a whole population.
+Importing this module never opens a window or loads an image (see
+Assets), so it is safe and cheap to use from worker processes.
+"""
+import pygame
+import copy
+import random
+import os
+import functools
+import multiprocessing
+import configparser
+import time
+import numpy as np
+import flappy_sim
+import flappy_nets
+
+WIN_WIDTH = 600
+WIN_HEIGHT = 800
+FLOOR = 730
+BIRD_X, BIRD_Y = 230, 350   # waar elke vogel begint, Bird(230,350)
+
+
+class Assets:
+    """
+    registry of the images and masks of the game. Every resource is
+    loaded the first time it is used, so importing the game costs nothing
+    and a headless run never loads what it does not draw.
+    """
+
+    # zonder convert_alpha, dat kan pas als er een scherm is (zie convert_images)
+    @functools.cached_property
+    def pipe_img(self):
+        return pygame.transform.scale2x(pygame.image.load(os.path.join("imgs","pipe.png")))
+
+    @functools.cached_property
+    def bg_img(self):
+        return pygame.transform.scale(pygame.image.load(os.path.join("imgs","bg.png")), (600, 900))
+
+    @functools.cached_property
+    def bird_images(self):
+        return [pygame.transform.scale2x(pygame.image.load(os.path.join("imgs","bird" + str(x) + ".png"))) for x in range(1,4)]
+
+    @functools.cached_property
+    def base_img(self):
+        return pygame.transform.scale2x(pygame.image.load(os.path.join("imgs","base.png")))
+
+    @functools.cached_property
+    def pipe_top(self):
+        return pygame.transform.flip(self.pipe_img, False, True)
+
+    @functools.cached_property
+    def bird_masks(self):
+        return {img: pygame.mask.from_surface(img) for img in self.bird_images}  # een masker per animatie plaatje
+
+    @functools.cached_property
+    def top_mask(self):
+        return pygame.mask.from_surface(self.pipe_top)
+
+    @functools.cached_property
+    def bottom_mask(self):
+        return pygame.mask.from_surface(self.pipe_img)
+
+    # dezelfde silhouetten als de maskers, als runs per rij (zie extent_narrow_phase)
+    @functools.cached_property
+    def bird_extents(self):
+        return {img: flappy_sim.RowExtents(mask_pixels(mask)) for img, mask in self.bird_masks.items()}
+
+    @functools.cached_property
+    def top_extents(self):
+        return flappy_sim.RowExtents(mask_pixels(self.top_mask))
+
+    @functools.cached_property
+    def bottom_extents(self):
+        return flappy_sim.RowExtents(mask_pixels(self.bottom_mask))
+
+    @functools.cached_property
+    def top_overlap(self):
+        return {img: flappy_sim.ExtentOverlap(extents, self.top_extents)
+                for img, extents in self.bird_extents.items()}
+
+    @functools.cached_property
+    def bottom_overlap(self):
+        return {img: flappy_sim.ExtentOverlap(extents, self.bottom_extents)
+                for img, extents in self.bird_extents.items()}
+
+    @functools.cached_property
+    def pipe_width(self):
+        return self.pipe_img.get_width()
+
+    @functools.cached_property
+    def pipe_height(self):
+        return self.pipe_img.get_height()
+
+    @functools.cached_property
+    def base_width(self):
+        return self.base_img.get_width()
+
+ASSETS = Assets()
+
+class asset:
+    """
+    class attribute that reads a resource from ASSETS when it is used
+    """
+
+    def __init__(self, name):
+        self.name = name
+
+    def __get__(self, obj, owner=None):
+        return getattr(ASSETS, self.name)
+
+def mask_pixels(mask):
+    """
+    the pixels of a pygame mask as an array
+    :param mask: pygame.mask.Mask
+    :return: bool array (height, width)
+    """
+    width, height = mask.get_size()
+    return np.array([[mask.get_at((x, y)) for x in range(width)] for y in range(height)], dtype=bool)
+
+def __getattr__(name):
+    # pipe_img, bg_img, bird_images and base_img used to be module globals
+    if name in ("pipe_img", "bg_img", "bird_images", "base_img"):
+        return getattr(ASSETS, name)
+    raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
+
+@functools.lru_cache(maxsize=None)
+def font(size, name="comicsans"):
+    """
+    cached pygame SysFont, looking up a system font is slow
+    :param size: int
+    :param name: font name (str)
+    :return: pygame.font.Font
+    """
+    pygame.font.init()
+    return pygame.font.SysFont(name, size)
+
+class Bird:
+    """
+    # Bird class vertegenwoordigd de flappy bird
+    """
+    MAX_ROTATION = 25
+    IMGS = asset("bird_images")
+    MASKS = asset("bird_masks")  # een masker per animatie plaatje
+    ROT_VEL = 20
+    ANIMATION_TIME = 5
+
+    def __init__(self, x, y):
+        """
+        Initialize the object
+        :param x: starting x pos (int)
+        :param y: starting y pos (int)
+        :return: None
+        """
+        self.x = x
+        self.y = y
+        self.tilt = 0  # degrees to tilt
+        self.tick_count = 0
+        self.vel = 0
+        self.height = self.y
+        self.img_count = 0
+        self.img = self.IMGS[0]
+
+    def jump(self):
+        """
+        make the bird jump
+        :return: None
+        """
+        self.vel = -10.5
+        self.tick_count = 0
+        self.height = self.y
+
+    def move(self):
+        """
+        make the bird move 
+        :return: None
+        """
+        self.tick_count += 1
+
+        # verplaatsing en kanteling staan per tick klaar in een tabel, zie flappy_sim.Trajectory
+        displacement, self.tilt = flappy_sim.trajectory(self.vel).step(self.tick_count)
+        self.y = self.y + displacement
+
+    def draw(self, win):
+        """
+        draw the bird
+        :param win: pygame window or surface
+        :return: list of the changed rects
+        """
+        self.img_count += 1
+
+           # For animation of bird, loop through three images 
+        if self.img_count <= self.ANIMATION_TIME:
+            self.img = self.IMGS[0]
+        elif self.img_count <= self.ANIMATION_TIME*2:
+            self.img = self.IMGS[1]
+        elif self.img_count <= self.ANIMATION_TIME*3:
+            self.img = self.IMGS[2]
+        elif self.img_count <= self.ANIMATION_TIME*4:
+            self.img = self.IMGS[1]
+        elif self.img_count == self.ANIMATION_TIME*4 + 1:
+            self.img = self.IMGS[0]
+            self.img_count = 0
+
+        # so when bird is nose diving it isn't flapping
+        if self.tilt <= -80:
+            self.img = self.IMGS[1]
+            self.img_count = self.ANIMATION_TIME*2
+
+
+        # tilt the bird
+        return [blitRotateCenter(win, self.img, (self.x, self.y), self.tilt)]
+
+    def get_mask(self):
+        """
+        gets the mask for the current image of the bird
+        :return: pygame.mask.Mask
+        """
+        return self.MASKS[self.img]
+
+
+class Pipe():
+    """
+    represents a pipe object
+    """
+    GAP = 160           #1 GAP 160 gemaakt 
+    VEL = 5             #2 VEL 5 gemaakt 
+
+    # gedeeld door alle pipes, een pipe zelf bewaart alleen positie en gat
+    PIPE_TOP = asset("pipe_top")
+    PIPE_BOTTOM = asset("pipe_img")
+    TOP_MASK = asset("top_mask")
+    BOTTOM_MASK = asset("bottom_mask")
+    TOP_OVERLAP = asset("top_overlap")        # per bird plaatje, zie extent_narrow_phase
+    BOTTOM_OVERLAP = asset("bottom_overlap")
+    WIDTH = asset("pipe_width")
+    HEIGHT = asset("pipe_height")
+    __slots__ = ("x", "height", "top", "bottom", "passed")
+
+    # tellers per generatie: uitgevoerde en door de broad phase overgeslagen mask.overlap tests
+    pixel_tests = 0
+    pixel_tests_skipped = 0
+
+    def __init__(self, x, height=None):
+        """
+        initialize pipe object
+        :param x: int
+        :param height: height from a Course, None for a random height (int)
+        :return" None
+        """
+        self.x = x
+        self.height = 0
+
+        # where the top and bottom of the pipe is
+        self.top = 0
+        self.bottom = 0
+
+        self.passed = False
+
+        self.set_height(height)
+
+    def set_height(self, height=None):
+        """
+        set the height of the pipe, from the top of the screen
+        :param height: None for a random height (int)
+        :return: None
+        """
+        if height is None:
+            height = random.randrange(50, 450)
+        self.height = height
+        self.top = self.height - self.HEIGHT
+        self.bottom = self.height + self.GAP
+
+    def move(self):
+        """
+        move pipe based on vel
+        :return: None
+        """
+        self.x -= self.VEL
+
+    @classmethod
+    def get_top_mask(cls):
+        """
+        gets the cached mask of the top (flipped) pipe, the same for every pipe
+        :return: pygame.mask.Mask
+        """
+        return cls.TOP_MASK
+
+    @classmethod
+    def get_bottom_mask(cls):
+        """
+        gets the cached mask of the bottom pipe, the same for every pipe
+        :return: pygame.mask.Mask
+        """
+        return cls.BOTTOM_MASK
+
+    def draw(self, win):
+        """
+        draw both the top and bottom of the pipe
+        :param win: pygame window/surface
+        :return: list of the changed rects
+        """
+        # draw top
+        top = win.blit(self.PIPE_TOP, (self.x, self.top))
+        # draw bottom
+        bottom = win.blit(self.PIPE_BOTTOM, (self.x, self.bottom))
+        return [top, bottom]
+
+
+    def collide(self, bird, win):
+        """
+        returns if a point is colliding with the pipe
+        :param bird: Bird object
+        :return: Bool
+        """
+        return collide_pipe(self.x, self.top, self.bottom, bird)
+
+
+def collide_pipe(x, top, bottom, bird):
+    """
+    pixel perfect collision of a bird with the pipe at x, see Pipe.collide
+    :param x: x of the pipe (int)
+    :param top: y of the top pipe image (int)
+    :param bottom: y of the bottom pipe image (int)
+    :param bird: Bird object
+    :return: Bool
+    """
+    bird_mask = bird.get_mask()
+    bird_w, bird_h = bird_mask.get_size()
+    pipe_w, pipe_h = Pipe.WIDTH, Pipe.HEIGHT
+    bird_y = round(bird.y)
+
+    # broad phase: buiten de rechthoek van een pipe kan geen pixel overlappen
+    if x - bird.x >= bird_w or x + pipe_w <= bird.x:
+        Pipe.pixel_tests_skipped += 2
+        return False
+
+    top_offset = (x - bird.x, top - bird_y)
+    bottom_offset = (x - bird.x, bottom - bird_y)
+    near_top = bird_y < top + pipe_h and bird_y + bird_h > top
+    near_bottom = bird_y < bottom + pipe_h and bird_y + bird_h > bottom
+    Pipe.pixel_tests += near_top + near_bottom
+    Pipe.pixel_tests_skipped += 2 - near_top - near_bottom
+
+    b_point = near_bottom and bird_mask.overlap(Pipe.get_bottom_mask(), bottom_offset)
+    t_point = near_top and bird_mask.overlap(Pipe.get_top_mask(), top_offset)
+
+    if b_point or t_point:
+        return True
+
+    return False
+
+
+class PipeQueue:
+    """
+    the pipes of a game, oldest first, as parallel arrays in a ring buffer
+    instead of a list of Pipe objects. Spawning and retiring a pipe costs
+    the same however long the game lasts, all pipes move with one array
+    operation, and the pipe the birds look at is a cursor that only moves
+    forward instead of a test every frame. There are never more than two
+    pipes on the screen, plus one on the frame a new one spawns.
+    """
+    CAPACITY = 4
+    ARRAYS = ("x", "height", "top", "bottom", "passed")
+
+    def __init__(self, capacity=CAPACITY):
+        """
+        Initialize an empty queue
+        :param capacity: most pipes at the same time (int)
+        :return: None
+        """
+        self.capacity = capacity
+        self.x = np.zeros(capacity, dtype=np.int64)
+        self.height = np.zeros(capacity, dtype=np.int64)
+        self.top = np.zeros(capacity, dtype=np.int64)
+        self.bottom = np.zeros(capacity, dtype=np.int64)
+        self.passed = np.zeros(capacity, dtype=bool)
+        self.head = 0       # slot van de oudste pipe
+        self.count = 0
+        self.cursor = 0     # pipe_ind: de pipe waar de vogels naar kijken, geteld vanaf head
+        self.unpassed = 0   # de eerste pipe die de vogels nog niet voorbij zijn, geteld vanaf head
+
+    def __len__(self):
+        return self.count
+
+    def slot(self, index):
+        """
+        slot in the arrays of a pipe
+        :param index: 0 for the oldest pipe (int)
+        :return: int
+        """
+        return (self.head + index) % self.capacity
+
+    def spawn(self, x, height):
+        """
+        add a pipe behind the others
+        :param x: int
+        :param height: height from a Course (int)
+        :return: None
+        """
+        if self.count == self.capacity:
+            raise IndexError("pipe queue is full ({} pipes)".format(self.capacity))
+        s = self.slot(self.count)
+        self.x[s] = x
+        self.height[s] = height
+        self.top[s] = height - Pipe.HEIGHT
+        self.bottom[s] = height + Pipe.GAP
+        self.passed[s] = False
+        self.count += 1
+
+    def retire(self):
+        """
+        remove the oldest pipe
+        :return: None
+        """
+        self.head = (self.head + 1) % self.capacity
+        self.count -= 1
+        self.cursor = max(self.cursor - 1, 0)
+        self.unpassed = max(self.unpassed - 1, 0)
+
+    def retire_gone(self):
+        """
+        remove the pipes that left the screen, they go in order
+        :return: None
+        """
+        while self.count and self.x[self.head] + Pipe.WIDTH < 0:
+            self.retire()
+
+    def move(self):
+        """
+        move every pipe, the empty slots as well because that is free
+        :return: None
+        """
+        self.x -= Pipe.VEL
+
+    def next_pipe(self, bird_x):
+        """
+        the pipe the birds look at: the first one, or the one after it as
+        soon as the birds are past the first (pipe_ind)
+        :param bird_x: x of the birds (int)
+        :return: slot (int)
+        """
+        if self.cursor + 1 < self.count and bird_x > self.x[self.slot(self.cursor)] + Pipe.WIDTH:
+            self.cursor += 1
+        return self.slot(self.cursor)
+
+    def pass_birds(self, bird_x):
+        """
+        mark the next pipe passed once the birds got past its left edge
+        :param bird_x: x of the birds (int)
+        :return: True if a pipe was passed this frame
+        """
+        if self.unpassed < self.count:
+            s = self.slot(self.unpassed)
+            if self.x[s] < bird_x:
+                self.passed[s] = True
+                self.unpassed += 1
+                return True
+        return False
+
+    def pipe(self, index):
+        """
+        position of a pipe as plain ints, read once per frame for the
+        collide_pipe calls of every bird
+        :param index: 0 for the oldest pipe (int)
+        :return: (x, top, bottom)
+        """
+        s = self.slot(index)
+        return int(self.x[s]), int(self.top[s]), int(self.bottom[s])
+
+    def draw(self, win):
+        """
+        draw every pipe, see Pipe.draw
+        :param win: pygame window/surface
+        :return: list of the changed rects
+        """
+        drawn = []
+        for i in range(self.count):
+            s = self.slot(i)
+            drawn.append(win.blit(Pipe.PIPE_TOP, (int(self.x[s]), int(self.top[s]))))
+            drawn.append(win.blit(Pipe.PIPE_BOTTOM, (int(self.x[s]), int(self.bottom[s]))))
+        return drawn
+
+    def copy(self, into=None):
+        """
+        a copy that can change without changing this queue
+        :param into: PipeQueue with the same capacity to copy into instead of a new one
+        :return: PipeQueue
+        """
+        if into is None:
+            into = copy.copy(self)
+            for name in self.ARRAYS:
+                setattr(into, name, getattr(self, name).copy())
+            return into
+        for name in self.ARRAYS:
+            getattr(into, name)[:] = getattr(self, name)
+        into.head, into.count, into.cursor, into.unpassed = self.head, self.count, self.cursor, self.unpassed
+        return into
+
+class Base:
+    """
+    Represnts the moving floor of the game
+    """
+    VEL = 5                  
+    WIDTH = asset("base_width")
+    IMG = asset("base_img")
+
+    def __init__(self, y):
+        """
+        Initialize the object
+        :param y: int
+        :return: None
+        """
+        self.y = y
+        self.x1 = 0
+        self.x2 = self.WIDTH
+
+    def move(self):
+        """
+        move floor so it looks like its scrolling
+        :return: None
+        """
+        self.x1 -= self.VEL
+        self.x2 -= self.VEL
+        if self.x1 + self.WIDTH < 0:
+            self.x1 = self.x2 + self.WIDTH
+
+        if self.x2 + self.WIDTH < 0:
+            self.x2 = self.x1 + self.WIDTH
+
+    def draw(self, win):
+        """
+        Draw the floor. This is two images that move together.
+        :param win: the pygame surface/window
+        :return: list of the changed rects
+        """
+        return [win.blit(self.IMG, (self.x1, self.y)),
+                win.blit(self.IMG, (self.x2, self.y))]
+
+
+# (image, angle) -> (rotated image, offset of its top left from the top left of image)
+ROTATION_ATLAS = {}
+
+def reachable_tilts():
+    """
+    every tilt Bird.move can produce, starting from 0
+    :return: sorted list of ints
+    """
+    tilts = set()
+    todo = [0]
+    while todo:
+        tilt = todo.pop()
+        if tilt in tilts:
+            continue
+        tilts.add(tilt)
+        todo.append(Bird.MAX_ROTATION if tilt < Bird.MAX_ROTATION else tilt)  # tilt up
+        todo.append(tilt - Bird.ROT_VEL if tilt > -90 else tilt)            # tilt down
+    return sorted(tilts)
+
+def rotated_sprite(image, angle):
+    """
+    the rotated image and its centered offset, from the atlas
+    :param image: the image surface to rotate
+    :param angle: a float value for angle
+    :return: (rotated image, (dx, dy))
+    """
+    key = (image, angle)
+    sprite = ROTATION_ATLAS.get(key)
+    if sprite is None:
+        rotated_image = pygame.transform.rotate(image, angle)
+        offset = rotated_image.get_rect(center = image.get_rect().center).topleft
+        sprite = ROTATION_ATLAS[key] = (rotated_image, offset)
+    return sprite
+
+def build_rotation_atlas():
+    """
+    rotate every bird image to every reachable tilt ahead of time
+    :return: None
+    """
+    for image in ASSETS.bird_images:
+        for tilt in reachable_tilts():
+            rotated_sprite(image, tilt)
+
+def blitRotateCenter(surf, image, topleft, angle):
+    """
+    Rotate a surface and blit it to the window
+    :param surf: the surface to blit to
+    :param image: the image surface to rotate
+    :param topLeft: the top left position of the image
+    :param angle: a float value for angle
+    :return: the changed rect
+    """
+    rotated_image, (dx, dy) = rotated_sprite(image, angle)
+    x, y = image.get_rect(topleft = topleft).topleft
+
+    return surf.blit(rotated_image, (x + dx, y + dy))
+
+
+class Course:
+    """
+    a seeded pipe course: the heights of the pipes in the order they spawn.
+    Heights are drawn lazily from a private random.Random and remembered, so
+    every game that iterates the same course meets the same pipes and the
+    global random state is left alone.
+    """
+
+    def __init__(self, seed=None):
+        """
+        Initialize the course
+        :param seed: seed of the course, None for a random course (int)
+        :return: None
+        """
+        self.seed = seed
+        self.rng = random.Random(seed)
+        self.heights = []
+
+    def height(self, index):
+        """
+        height of the pipe with the given spawn index
+        :param index: int
+        :return: int
+        """
+        while len(self.heights) <= index:
+            self.heights.append(self.rng.randrange(50, 450))
+        return self.heights[index]
+
+    def __iter__(self):
+        """
+        iterate over the pipe heights from the first pipe on, every
+        iterator starts at the first pipe
+        """
+        index = 0
+        while True:
+            yield self.height(index)
+            index += 1
+
+
+def course_seeds(seed=None, fixed=False, start=0):
+    """
+    the course seed of every generation
+    :param seed: seed of the sequence, None for random courses (int)
+    :param fixed: give every generation the same course (bool)
+    :param start: generation to start at, for resumed runs (int)
+    :return: generator of ints
+    """
+    rng = random.Random(seed)
+    course = rng.randrange(2**32)
+    generation = 0
+    while True:
+        if generation >= start:
+            yield course
+        generation += 1
+        if not fixed:
+            course = rng.randrange(2**32)
+
+class Budget:
+    """
+    limits that end a game before every bird is dead, so a generation
+    cannot take forever. Read from the [FlappyBird] section of the config
+    file, NEAT itself skips that section. 0 switches a limit off.
+    """
+    SECTION = "FlappyBird"
+    # deze grenzen hangen af van de andere vogels of van de machine, zie independent()
+    SHARED_LIMITS = ("fitness", "seconds")
+
+    def __init__(self, max_frames=0, max_seconds=0, fitness_cap=0, max_score=25):
+        """
+        Initialize the budget
+        :param max_frames: frames per game (int)
+        :param max_seconds: wall time per game (float)
+        :param fitness_cap: highest fitness a genome can get, the game ends when a bird reaches it (float)
+        :param max_score: the game ends when the score gets above this (int)
+        :return: None
+        """
+        self.max_frames = max_frames
+        self.max_seconds = max_seconds
+        self.fitness_cap = fitness_cap
+        self.max_score = max_score
+        self.started = time.perf_counter()
+        self.fired = None  # de grens die het laatste spel beëindigde
+
+    @staticmethod
+    def from_config(config_path):
+        """
+        read the budget from a config file, fitness_cap defaults to the
+        fitness_threshold of the [NEAT] section
+        :param config_path: location of config file
+        :return: Budget
+        """
+        parser = configparser.ConfigParser()
+        parser.read(config_path)
+        threshold = parser.getfloat("NEAT", "fitness_threshold", fallback=0)
+        if not parser.has_section(Budget.SECTION):
+            return Budget(fitness_cap=threshold)
+        section = parser[Budget.SECTION]
+        return Budget(max_frames=section.getint("max_frames", 0),
+                      max_seconds=section.getfloat("max_seconds", 0),
+                      fitness_cap=section.getfloat("fitness_cap", threshold),
+                      max_score=section.getint("max_score", 25))
+
+    def start(self):
+        """
+        start the clock for a new game
+        :return: None
+        """
+        self.started = time.perf_counter()
+        self.fired = None
+
+    def check(self, frames, score, best_fitness):
+        """
+        check the limits at the end of a frame
+        :param frames: frames played (int)
+        :param score: pipes passed (int)
+        :param best_fitness: highest fitness of the living birds (float)
+        :return: name of the limit that fired, None while the game may go on
+        """
+        if self.max_score and score > self.max_score:
+            self.fired = "score"
+        elif self.fitness_cap and best_fitness >= self.fitness_cap:
+            self.fired = "fitness"
+        elif self.max_frames and frames >= self.max_frames:
+            self.fired = "frames"
+        elif self.max_seconds and time.perf_counter() - self.started >= self.max_seconds:
+            self.fired = "seconds"
+        return self.fired
+
+    def clip(self, fitness):
+        """
+        cap a fitness at fitness_cap
+        :param fitness: float or array
+        :return: float or array
+        """
+        if not self.fitness_cap:
+            return fitness
+        return np.minimum(fitness, self.fitness_cap)
+
+    def independent(self):
+        """
+        did the last game give every bird the fitness it would have got
+        without the other birds? The fitness and wall time limits end the
+        game for everyone because of one bird or because of the machine.
+        :return: bool
+        """
+        return self.fired not in self.SHARED_LIMITS
+
+
+class MultiCourse:
+    """
+    plays every genome on several courses per generation and reduces the
+    fitnesses to one, so a genome that was lucky on one course is not
+    promoted for it. Read from the [FlappyBird] section of the config file
+    like Budget. With one course nothing changes.
+    """
+    REDUCERS = ("mean", "min", "quantile")
+
+    def __init__(self, courses=1, reducer="mean", quantile=0.25):
+        """
+        Initialize the settings
+        :param courses: courses per genome per generation (int)
+        :param reducer: how the fitnesses of a genome become one, one of REDUCERS (str)
+        :param quantile: the quantile the quantile reducer takes, 0 is the min (float)
+        :return: None
+        """
+        if reducer not in self.REDUCERS:
+            raise ValueError("unknown reducer {!r}, expected one of {}".format(reducer, ", ".join(self.REDUCERS)))
+        if not 0 <= quantile <= 1:
+            raise ValueError("quantile must be between 0 and 1, got {}".format(quantile))
+        self.courses = max(courses, 1)
+        self.reducer = reducer
+        self.quantile = quantile
+
+    @staticmethod
+    def from_config(config_path):
+        """
+        read the settings from a config file
+        :param config_path: location of config file
+        :return: MultiCourse
+        """
+        parser = configparser.ConfigParser()
+        parser.read(config_path)
+        if not parser.has_section(Budget.SECTION):
+            return MultiCourse()
+        section = parser[Budget.SECTION]
+        return MultiCourse(courses=section.getint("courses", 1),
+                           reducer=section.get("reducer", "mean"),
+                           quantile=section.getfloat("quantile", 0.25))
+
+    def seeds(self, seed):
+        """
+        the courses of a generation, the first is the course of seed itself
+        :param seed: course seed of the generation (int)
+        :return: list of ints
+        """
+        rng = random.Random(seed)
+        return [seed] + [rng.randrange(2**32) for _ in range(self.courses - 1)]
+
+    def reduce(self, fitness):
+        """
+        one fitness per genome
+        :param fitness: array (genomes, courses)
+        :return: array with one fitness per genome
+        """
+        if self.reducer == "min":
+            return fitness.min(axis=1)
+        if self.reducer == "quantile":
+            return np.quantile(fitness, self.quantile, axis=1)
+        return fitness.mean(axis=1)
+
+def convert_images():
+    """
+    convert the images to the pixel format of the display for faster
+    blitting, call once after pygame.display.set_mode
+    :return: None
+    """
+    ASSETS.pipe_img = ASSETS.pipe_img.convert_alpha()
+    ASSETS.pipe_top = ASSETS.pipe_top.convert_alpha()
+    ASSETS.bg_img = ASSETS.bg_img.convert_alpha()
+    ASSETS.base_img = ASSETS.base_img.convert_alpha()
+
+def extent_narrow_phase(dx, top_dy, bottom_dy):
+    """
+    pixel perfect test for flappy_sim.BirdPopulation.collide from the row
+    extents of the bird and pipe masks (flappy_sim.ExtentOverlap), for
+    all birds at once without a mask test per bird. Gives exactly what
+    mask.overlap with Bird.MASKS and Pipe.TOP_MASK/BOTTOM_MASK gives, see
+    flappy_bench --verify.
+    :param dx: x offset of the pipe relative to the birds (int, or array with one per bird)
+    :param top_dy: y offsets of the top pipe per bird (array)
+    :param bottom_dy: y offsets of the bottom pipe per bird (array)
+    :return: bool array
+    """
+    img = Bird.IMGS[0]  # zonder tekenen blijft het eerste plaatje staan
+    return Pipe.TOP_OVERLAP[img](dx, top_dy) | Pipe.BOTTOM_OVERLAP[img](dx, bottom_dy)
+
+def bird_population(size):
+    """
+    a flappy_sim.BirdPopulation with the geometry of this game: the birds
+    start where Bird(BIRD_X, BIRD_Y) starts and collide with the bird and
+    pipe images
+    :param size: number of birds (int)
+    :return: flappy_sim.BirdPopulation
+    """
+    return flappy_sim.BirdPopulation(size, BIRD_X, BIRD_Y, Bird.IMGS[0].get_size(), (Pipe.WIDTH, Pipe.HEIGHT))
+
+def frames_until_pipe_event(pipes, bird_x, bird_w):
+    """
+    number of frames until the pipe loop of simulate can do more than move
+    the pipes: a pipe reaches the birds, is passed or leaves the screen.
+    Pipes move a fixed Pipe.VEL per frame, so this follows from their x.
+    :param pipes: PipeQueue, as it is at the end of a frame
+    :param bird_x: x of the birds (int)
+    :param bird_w: width of the bird image (int)
+    :return: int, at least 1
+    """
+    frames = []
+    for i in range(len(pipes)):
+        s = pipes.slot(i)
+        x = int(pipes.x[s])
+        # x - VEL*k < grens, vanaf de eerste k waarvoor dat geldt gebeurt er iets
+        edges = [-Pipe.WIDTH]                       # van het scherm
+        if x - Pipe.VEL + Pipe.WIDTH > bird_x:
+            edges.append(bird_x + bird_w)           # botsen kan (broad phase van collide)
+        if not pipes.passed[s]:
+            edges.append(bird_x)                    # voorbij
+        frames.extend((x - edge) // Pipe.VEL + 1 for edge in edges)
+    return max(min(frames), 1)
+
+def simulate(genomes, config, course=None, profiler=None, fast_forward=False, budget=None, cache=None,
+             spectator=None):
+    """
+    plays one headless game with a bird for every genome, same rules as
+    eval_genomes. All birds move at once with flappy_sim.BirdPopulation
+    and all networks are activated at once with flappy_nets.BatchNetwork.
+    A bird's fitness only depends on its own network and the pipe course.
+    The arrays cost a fixed amount per frame, so with a few hundred birds
+    or less (the config has pop_size 20) the object loop of eval_genomes
+    is faster; this pays off from about a thousand birds (see the
+    eval_genomes_* and generation_* scenarios of flappy_bench).
+    With fast_forward the pipes are only tested when the next
+    pipe event (see frames_until_pipe_event) is due and the floor and
+    ceiling only when a bird could have reached them; the networks still
+    run every frame and the fitness is exactly the same.
+    :param genomes: list of genomes
+    :param config: neat config
+    :param course: Course to play, None for a random course
+    :param profiler: flappy_profile.FrameProfiler to report every frame to, None for no timing
+    :param fast_forward: skip the frames in which no pipe or bounds test can fire (bool)
+    :param budget: Budget that ends the game, None for only the score limit. budget.fired
+        tells which limit ended it
+    :param cache: flappy_nets.NetworkCache for the networks, None builds every network
+    :param spectator: flappy_spectate.SnapshotBuffer to publish frames to, None for no spectating
+    :return: array with the fitness of every genome
+    """
+    if course is None:
+        course = Course()
+    if budget is None:
+        budget = Budget()
+    heights = iter(course)
+
+    nets = flappy_nets.BatchNetwork.create(genomes, config, cache)
+    fitness = np.zeros(len(genomes))
+    birds = bird_population(len(genomes))
+
+    pipes = PipeQueue()
+    pipes.spawn(700, next(heights))
+    base = Base(FLOOR) if spectator is not None else None   # alleen om te tekenen
+    score = 0
+
+    frame = 0
+    pipe_event = 0    # eerste frame waarin de pipes weer getest moeten worden
+    bounds_event = 0  # eerste frame waarin een vogel de vloer of het plafond kan raken
+    budget.start()
+
+    while birds.alive.any():
+        frame += 1
+        if profiler:
+            profiler.start_frame()
+        pipe_ind = pipes.next_pipe(birds.x)
+
+        alive = np.flatnonzero(birds.alive)
+        birds.move()
+        fitness[alive] += 0.1
+        if profiler:
+            profiler.lap("move")
+
+        # alle levende vogels in een keer door hun netwerk
+        y = birds.y[alive]
+        inputs = np.column_stack((y, np.abs(y - pipes.height[pipe_ind]), np.abs(y - pipes.bottom[pipe_ind])))
+        jumping = np.zeros(len(genomes), dtype=bool)
+        jumping[alive] = nets.activate(inputs, alive)[:, 0] > 0.5
+        birds.jump(jumping)
+        if profiler:
+            profiler.lap("activate")
+
+        pipes.move()
+        if fast_forward and frame < pipe_event:
+            if profiler:
+                profiler.lap("pipes")
+        else:
+            for i in range(len(pipes)):
+                s = pipes.slot(i)
+                hit = birds.collide(pipes.x[s], pipes.height[s], pipes.bottom[s], extent_narrow_phase)
+                fitness[hit] -= 1
+            if profiler:
+                profiler.lap("pipes")
+
+            if pipes.pass_birds(birds.x):
+                score += 1
+                fitness[birds.alive] += 5
+                pipes.spawn(WIN_WIDTH, next(heights))
+            pipes.retire_gone()
+
+            if fast_forward:
+                pipe_event = frame + frames_until_pipe_event(pipes, birds.x, birds.bird_w)
+
+        if not fast_forward or frame >= bounds_event:
+            birds.kill_out_of_bounds(FLOOR)
+            if fast_forward:
+                bounds_event = frame + birds.frames_until_out_possible(FLOOR)
+        if profiler:
+            profiler.lap("bookkeeping")
+            profiler.end_frame(int(birds.alive.sum()))
+
+        if spectator is not None:
+            base.move()
+            if spectator.wants():
+                spectator.publish(birds.y[birds.alive], birds.tilt[birds.alive], pipes, pipe_ind,
+                                  (base.x1, base.x2), score)
+
+        best = fitness[birds.alive].max() if budget.fitness_cap and birds.alive.any() else 0.0
+        if budget.check(frame, score, best):
+            break
+
+    return budget.clip(fitness)
+
+def eval_shard(genomes, config, seed, fast_forward=False, budget=None, multi=None, play=None):
+    """
+    worker entry point: plays a shard of a generation on the pipe course of seed
+    :param genomes: list of genomes
+    :param config: neat config
+    :param seed: seed of the pipe course (int)
+    :param fast_forward: see simulate (bool)
+    :param budget: see simulate (Budget)
+    :param multi: MultiCourse, passed on to play
+    :param play: function like flappy_env.evaluate_courses, None plays one course with simulate
+    :return: (list with the fitness of every genome, limit that ended the game or None)
+    """
+    if budget is None:
+        budget = Budget()
+    if play is None:
+        fitness = simulate(genomes, config, Course(seed), fast_forward=fast_forward, budget=budget,
+                           cache=SHARD_CACHE)
+    else:
+        fitness = play(genomes, config, seed, multi, fast_forward=fast_forward, budget=budget, cache=SHARD_CACHE)
+    return fitness.tolist(), budget.fired
+
+
+SHARD_CACHE = flappy_nets.NetworkCache()  # per worker, de elites komen elke generatie terug
+
+
+class ParallelEvaluator:
+    """
+    evaluates a generation over a pool of worker processes, like
+    neat.ParallelEvaluator but with shards of genomes instead of single
+    genomes. All shards of a generation play the same seeded pipe course.
+    """
+
+    def __init__(self, num_workers, shards_per_worker=4, seed=None, fixed_course=False, fast_forward=False,
+                 budget=None, start_generation=0, cache=None, multi=None, play=None):
+        """
+        Start the worker pool
+        :param num_workers: number of worker processes (int)
+        :param shards_per_worker: shards per worker per generation, more shards balance better (int)
+        :param seed: seed for the pipe courses, see course_seeds (int)
+        :param fixed_course: play the same course every generation (bool)
+        :param fast_forward: see simulate (bool)
+        :param budget: Budget for every shard, the wall time limit counts per shard
+        :param start_generation: first generation to evaluate, for resumed runs (int)
+        :param cache: flappy_nets.NetworkCache with the fitness of earlier genomes, genomes
+            found in it are not sent to the workers. None plays every genome.
+        :param multi: MultiCourse, None for one course
+        :param play: module level function like flappy_env.evaluate_courses that plays a shard,
+            needed for more than one course. None plays one course with simulate.
+        :return: None
+        """
+        if play is None and multi is not None and multi.courses > 1:
+            raise ValueError("more than one course needs play, see flappy_env.evaluate_courses")
+        self.num_workers = num_workers
+        self.fast_forward = fast_forward
+        self.budget = budget
+        self.cache = cache
+        self.multi = multi
+        self.play = play
+        self.num_shards = num_workers * shards_per_worker
+        self.seeds = course_seeds(seed, fixed_course, start_generation)
+        self.pool = multiprocessing.Pool(num_workers)
+
+    def close(self):
+        """
+        stop the worker pool
+        :return: None
+        """
+        self.pool.close()
+        self.pool.join()
+
+    def evaluate(self, genomes, config):
+        """
+        set the fitness of every genome, can be passed to Population.run
+        :param genomes: list of (genome_id, genome)
+        :param config: neat config
+        :return: None
+        """
+        ge = [genome for genome_id, genome in genomes]
+        seed = next(self.seeds)
+        if self.cache is not None:
+            for genome in ge:
+                genome.fitness = self.cache.fitness(genome, seed)
+            ge = [genome for genome in ge if genome.fitness is None]
+        size = max(-(-len(ge) // self.num_shards), 1)
+        shards = [ge[i:i + size] for i in range(0, len(ge), size)]
+
+        results = self.pool.starmap(eval_shard, [(shard, config, seed, self.fast_forward, self.budget,
+                                                  self.multi, self.play) for shard in shards])
+        for shard, (fitness, fired) in zip(shards, results):
+            for genome, f in zip(shard, fitness):
+                genome.fitness = f
+                if self.cache is not None and fired not in Budget.SHARED_LIMITS:
+                    self.cache.store_fitness(genome, seed, f)
+
+        fired = sorted({fired for fitness, fired in results if fired})
+        if fired:
+            print("Generation stopped by the {} limit".format(", ".join(fired)))
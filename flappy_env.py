@@ -0,0 +1,290 @@
+"""
+Gym style environment for many independent games at once. Every game has
+one bird and its own seeded pipe course; all state lives in NumPy arrays,
+so a step costs a handful of array operations no matter how many games
+run. The rules are the same as eval_genomes: observations are the inputs
+of the networks and the rewards add up to the fitness a genome gets.
+
+    env = FlappyVecEnv(1000, seed=1)
+    obs = env.reset()
+    while True:
+        obs, reward, done, info = env.step(obs[:, 1] > obs[:, 2])
+"""
+import numpy as np
+import flappy_core
+import flappy_nets
+
+FRAME_REWARD = 0.1
+PIPE_REWARD = 5
+COLLISION_REWARD = -1
+PIPE_SLOTS = 3   # er staan nooit meer dan twee pipes tegelijk, plus een die net verschijnt
+NO_PIPE = -10**6  # x van een lege plek, ver buiten beeld
+
+
+class FlappyVecEnv:
+    """
+    num_envs games of one bird each. A step is one frame of every game:
+    the bird jumps or not, the pipes move and the bird dies or lives on.
+    Finished games start again right away on a new course, so the batch
+    always stays full, unless auto_reset is off.
+    """
+
+    def __init__(self, num_envs, seed=None, max_score=25, max_frames=0, auto_reset=True):
+        """
+        Initialize the environments, call reset before the first step
+        :param num_envs: number of games (int)
+        :param seed: seed for the courses of the games, None for random courses (int)
+        :param max_score: a game ends when its score gets above this, 0 for no limit (int)
+        :param max_frames: a game ends after this many frames, 0 for no limit (int)
+        :param auto_reset: restart finished games; without it a finished game stays as it
+            ended, gets no more rewards and keeps done set (bool)
+        :return: None
+        """
+        self.num_envs = num_envs
+        self.max_score = max_score
+        self.max_frames = max_frames
+        self.auto_reset = auto_reset
+        self.course_seeds = flappy_core.course_seeds(seed)
+
+        self.birds = flappy_core.bird_population(num_envs)
+        self.pipe_x = np.full((num_envs, PIPE_SLOTS), NO_PIPE, dtype=np.int64)
+        self.pipe_height = np.zeros((num_envs, PIPE_SLOTS), dtype=np.int64)
+        self.passed = np.zeros((num_envs, PIPE_SLOTS), dtype=bool)
+        self.pipe_count = np.zeros(num_envs, dtype=np.int64)   # pipes staan vooraan, oudste eerst
+        self.pipe_ind = np.zeros(num_envs, dtype=np.int64)
+
+        self.seeds = np.zeros(num_envs, dtype=np.int64)
+        self.courses = [None] * num_envs
+        self.heights = np.zeros((num_envs, max_score + 2 if max_score else 32), dtype=np.int64)
+        self.next_pipe = np.zeros(num_envs, dtype=np.int64)   # index in de course van de volgende pipe
+        self.score = np.zeros(num_envs, dtype=np.int64)
+        self.frames = np.zeros(num_envs, dtype=np.int64)
+
+    def __len__(self):
+        return self.num_envs
+
+    def reset(self, seeds=None):
+        """
+        start a new game in every environment
+        :param seeds: course seed per game, None for the next seeds of the environment
+        :return: observations, array (num_envs, 3)
+        """
+        if seeds is not None and len(seeds) != self.num_envs:
+            raise ValueError("expected {} seeds, got {}".format(self.num_envs, len(seeds)))
+        self.reset_games(np.arange(self.num_envs), seeds)
+        self.start_frame()
+        return self.observe()
+
+    def reset_games(self, rows, seeds=None):
+        """
+        put the selected games back at their first frame on a new course
+        :param rows: indices of the games
+        :param seeds: course seed per row, None for the next seeds of the environment
+        :return: None
+        """
+        if seeds is None:
+            seeds = [next(self.course_seeds) for _ in rows]
+        courses = {}  # spellen met dezelfde seed delen hun course
+        for row, seed in zip(rows, seeds):
+            seed = int(seed)
+            if seed not in courses:
+                course = flappy_core.Course(seed)
+                courses[seed] = (course, [course.height(i) for i in range(self.heights.shape[1])])
+            self.seeds[row] = seed
+            self.courses[row], self.heights[row] = courses[seed]
+
+        self.birds.reset(rows)
+        self.pipe_x[rows] = NO_PIPE
+        self.pipe_x[rows, 0] = 700
+        self.pipe_height[rows, 0] = self.heights[rows, 0]
+        self.passed[rows] = False
+        self.pipe_count[rows] = 1
+        self.next_pipe[rows] = 1
+        self.score[rows] = 0
+        self.frames[rows] = 0
+
+    def start_frame(self):
+        """
+        first half of a frame of eval_genomes, up to where the network is
+        asked: pick the pipe to look at and move the birds
+        :return: None
+        """
+        width = flappy_core.Pipe.WIDTH
+        self.pipe_ind = ((self.pipe_count > 1) & (self.birds.x > self.pipe_x[:, 0] + width)).astype(np.int64)
+        self.frames[self.birds.alive] += 1
+        self.birds.move()
+
+    def observe(self):
+        """
+        the inputs of the networks: (y, |y - pipe height|, |y - pipe bottom|)
+        :return: array (num_envs, 3)
+        """
+        rows = np.arange(self.num_envs)
+        height = self.pipe_height[rows, self.pipe_ind]
+        y = self.birds.y
+        return np.column_stack((y, np.abs(y - height), np.abs(y - (height + flappy_core.Pipe.GAP))))
+
+    def step(self, actions):
+        """
+        play the rest of the frame with the given actions and start the next
+        one. Games that ended are reset, their observation is the first of
+        the new game.
+        :param actions: jump or not per game (bool array)
+        :return: (observations, rewards, dones, info), info holds the score, frames,
+            seed and truncated (ended by a limit instead of a crash) of every game
+            as it was at the end of this frame
+        """
+        birds = self.birds
+        Pipe = flappy_core.Pipe
+        rewards = np.where(birds.alive, FRAME_REWARD, 0.0)
+        birds.jump(np.asarray(actions, dtype=bool))
+
+        # afgelopen spellen (zonder auto_reset) blijven staan zoals ze eindigden
+        exists = (np.arange(PIPE_SLOTS) < self.pipe_count[:, None]) & birds.alive[:, None]
+        self.pipe_x[exists] -= Pipe.VEL
+        for slot in range(PIPE_SLOTS):
+            if not exists[:, slot].any():
+                continue
+            hit = birds.collide(self.pipe_x[:, slot], self.pipe_height[:, slot],
+                                self.pipe_height[:, slot] + Pipe.GAP, flappy_core.extent_narrow_phase)
+            rewards[hit] += COLLISION_REWARD
+
+        # de pipes die in dit frame voorbij de vogel gingen
+        passing = exists & ~self.passed & (self.pipe_x < birds.x)
+        self.passed |= passing
+        add_pipe = np.flatnonzero(passing.any(axis=1))
+        self.score[add_pipe] += 1
+        rewards[add_pipe[birds.alive[add_pipe]]] += PIPE_REWARD
+        self.spawn(add_pipe)
+        self.retire(np.flatnonzero(exists[:, 0] & (self.pipe_x[:, 0] + Pipe.WIDTH < 0)))
+
+        birds.kill_out_of_bounds(flappy_core.FLOOR)
+        truncated = birds.alive & (self.max_score > 0) & (self.score > self.max_score)
+        if self.max_frames:
+            truncated |= birds.alive & (self.frames >= self.max_frames)
+        dones = ~birds.alive | truncated
+        info = {"score": self.score.copy(), "frames": self.frames.copy(), "seed": self.seeds.copy(),
+                "truncated": truncated}
+
+        if self.auto_reset:
+            finished = np.flatnonzero(dones)
+            if len(finished):
+                self.reset_games(finished)
+        else:
+            birds.alive &= ~truncated
+        self.start_frame()
+        return self.observe(), rewards, dones, info
+
+    def spawn(self, rows):
+        """
+        add the next pipe of the course behind the others
+        :param rows: indices of the games
+        :return: None
+        """
+        if len(rows) == 0:
+            return
+        if self.next_pipe[rows].max() >= self.heights.shape[1]:
+            self.grow()
+        slot = self.pipe_count[rows]
+        self.pipe_x[rows, slot] = flappy_core.WIN_WIDTH
+        self.pipe_height[rows, slot] = self.heights[rows, self.next_pipe[rows]]
+        self.passed[rows, slot] = False
+        self.pipe_count[rows] += 1
+        self.next_pipe[rows] += 1
+
+    def retire(self, rows):
+        """
+        remove the first pipe, it left the screen
+        :param rows: indices of the games
+        :return: None
+        """
+        if len(rows) == 0:
+            return
+        for a in (self.pipe_x, self.pipe_height, self.passed):
+            a[rows, :-1] = a[rows, 1:]
+        self.pipe_x[rows, -1] = NO_PIPE
+        self.pipe_count[rows] -= 1
+
+    def grow(self):
+        """
+        twice as many pipe heights per course, only without a score limit
+        :return: None
+        """
+        width = self.heights.shape[1]
+        more = np.array([[course.height(i) for i in range(width, 2 * width)] for course in self.courses],
+                        dtype=np.int64)
+        self.heights = np.concatenate((self.heights, more), axis=1)
+
+
+def play_courses(genomes, config, seeds, budget=None, cache=None, profiler=None):
+    """
+    plays every genome on every course in one batch of len(genomes) *
+    len(seeds) games, the networks are activated together for all of them.
+    Per course the fitness is the same as flappy_core.simulate gives.
+    :param genomes: list of genomes
+    :param config: neat config
+    :param seeds: seeds of the pipe courses
+    :param budget: flappy_core.Budget, the score and frame limits end every game at the
+        same frame, the fitness and wall time limits end the whole batch. None for only
+        the score limit.
+    :param cache: flappy_nets.NetworkCache for the networks, None builds every network
+    :param profiler: flappy_profile.FrameProfiler to report every frame to, None for no timing
+    :return: array (genomes, courses) with the fitness of every genome on every course
+    """
+    if budget is None:
+        budget = flappy_core.Budget()
+    count, courses = len(genomes), len(seeds)
+    nets = flappy_nets.BatchNetwork.create(genomes, config, cache)
+    genome_of = np.repeat(np.arange(count), courses)   # spel g * courses + c: genome g op course c
+
+    env = FlappyVecEnv(count * courses, max_score=budget.max_score, max_frames=budget.max_frames,
+                       auto_reset=False)
+    obs = env.reset(np.tile(np.asarray(seeds, dtype=np.int64), count))
+    fitness = np.zeros(count * courses)
+    frame = 0
+    budget.start()
+
+    while env.birds.alive.any():
+        frame += 1
+        if profiler:
+            profiler.start_frame()
+        alive = np.flatnonzero(env.birds.alive)
+        jumping = np.zeros(len(env), dtype=bool)
+        jumping[alive] = nets.activate(obs[alive], genome_of[alive])[:, 0] > 0.5
+        if profiler:
+            profiler.lap("activate")
+
+        obs, rewards, dones, info = env.step(jumping)
+        fitness += rewards
+        if profiler:
+            profiler.lap("pipes")
+            profiler.end_frame(int(env.birds.alive.sum()))
+
+        playing = env.birds.alive | info["truncated"]
+        best = fitness[playing].max() if budget.fitness_cap and playing.any() else 0.0
+        if budget.check(frame, info["score"].max(), best):
+            break
+
+    return budget.clip(fitness).reshape(count, courses)
+
+
+def evaluate_courses(genomes, config, seed, multi=None, profiler=None, fast_forward=False, budget=None,
+                     cache=None, spectator=None):
+    """
+    the fitness of every genome for a generation with course seed: one
+    game with flappy_core.simulate, or with several courses all courses at
+    once with play_courses, reduced to one fitness per genome. Also what
+    the workers of flappy_core.ParallelEvaluator play with several courses.
+    :param genomes: list of genomes
+    :param config: neat config
+    :param seed: course seed of the generation (int)
+    :param multi: flappy_core.MultiCourse, None for one course
+    :param fast_forward: see flappy_core.simulate, only used with one course (bool)
+    :param spectator: see flappy_core.simulate, only used with one course
+    :return: array with the fitness of every genome
+    """
+    if multi is None or multi.courses == 1:
+        return flappy_core.simulate(genomes, config, flappy_core.Course(seed), profiler, fast_forward, budget,
+                                    cache, spectator)
+    fitness = play_courses(genomes, config, multi.seeds(seed), budget, cache, profiler)
+    return multi.reduce(fitness)
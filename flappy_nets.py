@@ -0,0 +1,411 @@
+"""
+Batched activation of a whole population of NEAT feed forward networks.
+Every network is flattened once into padded NumPy arrays, after which
+all living birds are activated together with a few array operations
+per node position instead of one pure Python activate() call per bird.
+"""
+import collections
+import hashlib
+import numpy as np
+import neat
+
+
+def sigmoid_activation(z):
+    return 1.0 / (1.0 + np.exp(-np.clip(5.0 * z, -60.0, 60.0)))
+
+
+def tanh_activation(z):
+    return np.tanh(np.clip(2.5 * z, -60.0, 60.0))
+
+
+def sin_activation(z):
+    return np.sin(np.clip(5.0 * z, -60.0, 60.0))
+
+
+def gauss_activation(z):
+    return np.exp(-5.0 * np.clip(z, -3.4, 3.4)**2)
+
+
+def relu_activation(z):
+    return np.where(z > 0.0, z, 0.0)
+
+
+def identity_activation(z):
+    return z
+
+
+def clamped_activation(z):
+    return np.clip(z, -1.0, 1.0)
+
+
+def abs_activation(z):
+    return np.abs(z)
+
+
+# same behaviour as the functions with the same name in neat.activations
+ACTIVATIONS = [sigmoid_activation, tanh_activation, sin_activation, gauss_activation,
+               relu_activation, identity_activation, clamped_activation, abs_activation]
+ACTIVATION_IDS = {f.__name__: i for i, f in enumerate(ACTIVATIONS)}
+
+
+def genome_hash(genome):
+    """
+    content hash of everything the network of a genome is built from: the
+    nodes with their bias, response, activation and aggregation and the
+    connections with their weight. Genomes with the same hash get the same
+    network, whatever their key.
+    :param genome: neat genome
+    :return: str
+    """
+    nodes = tuple((key, node.bias, node.response, node.activation, node.aggregation)
+                  for key, node in sorted(genome.nodes.items()))
+    connections = tuple((key, conn.weight, conn.enabled) for key, conn in sorted(genome.connections.items()))
+    # repr van een float is exact, dus alleen echt gelijke genomes botsen
+    return hashlib.blake2b(repr((nodes, connections)).encode(), digest_size=16).hexdigest()
+
+
+class NetworkCache:
+    """
+    networks of earlier genomes by genome_hash, so elites and other
+    unchanged genomes are not built again every generation. Optionally also
+    remembers the fitness a genome got on a course. The least recently used
+    genomes are dropped when the cache is full. Only valid for one config.
+    """
+
+    def __init__(self, size=1000):
+        """
+        Initialize the cache
+        :param size: number of genomes to keep (int)
+        :return: None
+        """
+        self.size = size
+        self.entries = collections.OrderedDict()  # hash -> [netwerk, {course seed: fitness}]
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def entry(self, genome):
+        """
+        the entry of a genome, a new one if it is not in the cache
+        :param genome: neat genome
+        :return: [network or None, dict of fitness per course seed]
+        """
+        key = genome_hash(genome)
+        entry = self.entries.get(key)
+        if entry is None:
+            entry = self.entries[key] = [None, {}]
+            if len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+        else:
+            self.entries.move_to_end(key)
+        return entry
+
+    def network(self, genome, config):
+        """
+        the network of a genome, built only if no genome with the same
+        hash was seen before. A drop in replacement for FeedForwardNetwork.create.
+        :param genome: neat genome
+        :param config: neat config
+        :return: neat.nn.FeedForwardNetwork
+        """
+        entry = self.entry(genome)
+        if entry[0] is None:
+            self.misses += 1
+            entry[0] = neat.nn.FeedForwardNetwork.create(genome, config)
+        else:
+            self.hits += 1
+        return entry[0]
+
+    def fitness(self, genome, seed):
+        """
+        the fitness a genome with the same hash got on a course
+        :param genome: neat genome
+        :param seed: seed of the pipe course (int)
+        :return: float, None if unknown
+        """
+        return self.entry(genome)[1].get(seed)
+
+    def store_fitness(self, genome, seed, fitness):
+        """
+        remember the fitness of a genome on a course
+        :param genome: neat genome
+        :param seed: seed of the pipe course (int)
+        :param fitness: float
+        :return: None
+        """
+        self.entry(genome)[1][seed] = fitness
+
+    def stats(self):
+        """
+        one line about the network hits since the last call, for the log
+        :return: str
+        """
+        line = "Network cache: {} reused, {} built, {} genomes cached".format(self.hits, self.misses, len(self))
+        self.hits = self.misses = 0
+        return line
+
+
+class BatchNetwork:
+    """
+    many feed forward networks evaluated as one batch. Networks are padded to
+    the same number of nodes and links; node j of every network is evaluated
+    together, links are summed in the same order as FeedForwardNetwork.activate.
+    """
+
+    def __init__(self, nets):
+        """
+        Flatten the networks into arrays
+        :param nets: list of neat.nn.FeedForwardNetwork, all with the same inputs and outputs
+        :return: None
+        """
+        self.num_inputs = len(nets[0].input_nodes)
+        self.num_outputs = len(nets[0].output_nodes)
+        self.num_nodes = max([len(net.node_evals) for net in nets] + [1])
+        self.num_links = max([len(links) for net in nets for *_, links in net.node_evals] + [1])
+
+        count = len(nets)
+        self.zero_slot = self.num_inputs + self.num_nodes  # always 0.0, used for padding
+        self.src = np.full((count, self.num_nodes, self.num_links), self.zero_slot, dtype=np.int64)
+        self.weight = np.zeros((count, self.num_nodes, self.num_links))
+        self.bias = np.zeros((count, self.num_nodes))
+        self.response = np.ones((count, self.num_nodes))
+        self.act = np.full((count, self.num_nodes), ACTIVATION_IDS["identity_activation"], dtype=np.int64)
+        self.out_slot = np.full((count, self.num_outputs), self.zero_slot, dtype=np.int64)
+
+        for g, net in enumerate(nets):
+            slot = {key: i for i, key in enumerate(net.input_nodes)}
+            for j, (node, act_func, agg_func, bias, response, links) in enumerate(net.node_evals):
+                if agg_func.__name__ != "sum_aggregation":
+                    raise ValueError("unsupported aggregation for batching: {}".format(agg_func.__name__))
+                if act_func.__name__ not in ACTIVATION_IDS:
+                    raise ValueError("unsupported activation for batching: {}".format(act_func.__name__))
+
+                for k, (i, w) in enumerate(links):
+                    self.src[g, j, k] = slot.get(i, self.zero_slot)
+                    self.weight[g, j, k] = w
+                self.bias[g, j] = bias
+                self.response[g, j] = response
+                self.act[g, j] = ACTIVATION_IDS[act_func.__name__]
+                slot[node] = self.num_inputs + j
+
+            for o, key in enumerate(net.output_nodes):
+                self.out_slot[g, o] = slot.get(key, self.zero_slot)
+
+    @staticmethod
+    def create(genomes, config, cache=None):
+        """
+        Build the networks of the genomes and flatten them
+        :param genomes: list of genomes
+        :param config: neat config
+        :param cache: NetworkCache to take unchanged networks from, None builds every network
+        :return: BatchNetwork
+        """
+        if cache is not None:
+            return BatchNetwork([cache.network(genome, config) for genome in genomes])
+        return BatchNetwork([neat.nn.FeedForwardNetwork.create(genome, config) for genome in genomes])
+
+    def __len__(self):
+        return len(self.bias)
+
+    def activate(self, inputs, rows=None):
+        """
+        activate the networks of the given rows
+        :param inputs: array of shape (len(rows), num_inputs)
+        :param rows: indices of the networks to activate, None for all
+        :return: array of shape (len(rows), num_outputs)
+        """
+        if rows is None:
+            rows = np.arange(len(self))
+        count = len(rows)
+        src, weight = self.src[rows], self.weight[rows]
+        bias, response, act = self.bias[rows], self.response[rows], self.act[rows]
+
+        values = np.zeros((count, self.zero_slot + 1))
+        values[:, :self.num_inputs] = inputs
+        r = np.arange(count)
+
+        for j in range(self.num_nodes):
+            s = values[r, src[:, j, 0]] * weight[:, j, 0]
+            for k in range(1, self.num_links):
+                s = s + values[r, src[:, j, k]] * weight[:, j, k]
+            z = bias[:, j] + response[:, j] * s
+
+            ids = act[:, j]
+            first = ids[0] if count else 0
+            if (ids == first).all():
+                values[:, self.num_inputs + j] = ACTIVATIONS[first](z)
+            else:
+                out = np.empty(count)
+                for a in np.unique(ids):
+                    sel = ids == a
+                    out[sel] = ACTIVATIONS[a](z[sel])
+                values[:, self.num_inputs + j] = out
+
+        return values[r[:, None], self.out_slot[rows]]
+
+
+class Champion:
+    """
+    a single network flattened into layers for fast inference and for
+    storing without pickle. Every layer is one matrix product over the
+    inputs and all nodes of the layers before it. The .npz file only
+    holds arrays and a format version, no neat-python objects.
+    """
+    VERSION = 1
+
+    def __init__(self, num_inputs, layers, out_slot, meta=None):
+        """
+        Initialize the network
+        :param num_inputs: int
+        :param layers: list of (weight, bias, response, act) per layer, weight has shape
+            (nodes in the layer, inputs + nodes before the layer), act holds ACTIVATION_IDS
+        :param out_slot: index of every output in the value vector, the last slot is always 0.0
+        :param meta: dict with extra numbers to store, like the genome key and fitness
+        :return: None
+        """
+        self.num_inputs = num_inputs
+        self.layers = []
+        for weight, bias, response, act in layers:
+            act = np.asarray(act, dtype=np.int64)
+            # per activatie functie de nodes in deze laag
+            groups = [(ACTIVATIONS[a], np.flatnonzero(act == a)) for a in np.unique(act)]
+            self.layers.append((np.asarray(weight, dtype=np.float64), np.asarray(bias, dtype=np.float64),
+                                np.asarray(response, dtype=np.float64), act, groups))
+        self.num_values = num_inputs + sum(len(bias) for _, bias, *_ in self.layers)
+        self.out_slot = np.asarray(out_slot, dtype=np.int64)
+        self.meta = dict(meta or {})
+
+        # dezelfde nodes als Python lijsten voor activate: (slot, [(bron, gewicht)], bias, response, functie)
+        self.nodes = []
+        start = num_inputs
+        for weight, bias, response, act, groups in self.layers:
+            for j in range(len(bias)):
+                links = [(int(i), float(weight[j, i])) for i in np.flatnonzero(weight[j])]
+                f = getattr(neat.activations, ACTIVATIONS[act[j]].__name__)
+                self.nodes.append((start + j, links, float(bias[j]), float(response[j]), f))
+            start += len(bias)
+        self.values = [0.0] * (self.num_values + 1)
+        self.out_list = self.out_slot.tolist()
+
+    @staticmethod
+    def create(genome, config):
+        """
+        Flatten the network of a genome
+        :param genome: neat genome
+        :param config: neat config
+        :return: Champion
+        """
+        net = neat.nn.FeedForwardNetwork.create(genome, config)
+        num_inputs = len(net.input_nodes)
+        depth = {key: 0 for key in net.input_nodes}
+        layered = []
+        for node, act_func, agg_func, bias, response, links in net.node_evals:
+            if agg_func.__name__ != "sum_aggregation":
+                raise ValueError("unsupported aggregation for export: {}".format(agg_func.__name__))
+            if act_func.__name__ not in ACTIVATION_IDS:
+                raise ValueError("unsupported activation for export: {}".format(act_func.__name__))
+            depth[node] = 1 + max([depth.get(i, 0) for i, w in links] + [0])
+            layered.append((depth[node], node, act_func, bias, response, links))
+
+        # de value vector: eerst de inputs, dan de nodes laag voor laag, als laatste een vaste 0.0
+        layered.sort(key=lambda n: n[0])  # stabiel, binnen een laag blijft de volgorde van neat
+        slot = {key: i for i, key in enumerate(net.input_nodes)}
+        for i, (_, node, *_) in enumerate(layered):
+            slot[node] = num_inputs + i
+        zero = num_inputs + len(layered)
+
+        layers = []
+        start = 0
+        while start < len(layered):
+            end = start
+            while end < len(layered) and layered[end][0] == layered[start][0]:
+                end += 1
+            nodes = layered[start:end]
+            weight = np.zeros((len(nodes), num_inputs + start))
+            for j, (_, node, act_func, bias, response, links) in enumerate(nodes):
+                for i, w in links:
+                    if i in slot:
+                        weight[j, slot[i]] += w
+            layers.append((weight,
+                           [bias for _, _, _, bias, _, _ in nodes],
+                           [response for _, _, _, _, response, _ in nodes],
+                           [ACTIVATION_IDS[act_func.__name__] for _, _, act_func, _, _, _ in nodes]))
+            start = end
+
+        out_slot = [slot.get(key, zero) for key in net.output_nodes]
+        return Champion(num_inputs, layers, out_slot,
+                        {"genome_key": genome.key, "fitness": genome.fitness if genome.fitness is not None else np.nan})
+
+    def save(self, path):
+        """
+        write the network to an .npz file
+        :param path: str
+        :return: None
+        """
+        arrays = {"version": self.VERSION, "num_inputs": self.num_inputs, "out_slot": self.out_slot,
+                  "layers": len(self.layers), "activation_names": np.array([f.__name__ for f in ACTIVATIONS])}
+        for l, (weight, bias, response, act, groups) in enumerate(self.layers):
+            arrays["weight_{}".format(l)] = weight
+            arrays["bias_{}".format(l)] = bias
+            arrays["response_{}".format(l)] = response
+            arrays["act_{}".format(l)] = act
+        for key, value in self.meta.items():
+            arrays["meta_{}".format(key)] = value
+        np.savez(path, **arrays)
+
+    @staticmethod
+    def load(path):
+        """
+        read a network written by save, without unpickling anything
+        :param path: str
+        :return: Champion
+        """
+        with np.load(path) as data:
+            if int(data["version"]) != Champion.VERSION:
+                raise ValueError("unsupported champion version {} in {}".format(int(data["version"]), path))
+            # ids in het bestand naar ids van deze versie van ACTIVATIONS
+            ids = np.array([ACTIVATION_IDS[name] for name in data["activation_names"]], dtype=np.int64)
+            layers = [(data["weight_{}".format(l)], data["bias_{}".format(l)], data["response_{}".format(l)],
+                       ids[data["act_{}".format(l)]]) for l in range(int(data["layers"]))]
+            meta = {key[len("meta_"):]: data[key].item() for key in data.files if key.startswith("meta_")}
+            return Champion(int(data["num_inputs"]), layers, data["out_slot"], meta)
+
+    def activate(self, inputs):
+        """
+        activate the network for one decision, a drop in replacement for
+        FeedForwardNetwork.activate. For a handful of nodes plain Python
+        is faster than the overhead of NumPy calls.
+        :param inputs: num_inputs values
+        :return: list with the outputs
+        """
+        values = self.values
+        values[:self.num_inputs] = inputs
+        for slot, links, bias, response, f in self.nodes:
+            s = 0.0
+            for i, w in links:
+                s += values[i] * w
+            values[slot] = f(bias + response * s)
+        return [values[i] for i in self.out_list]
+
+    def activate_many(self, inputs):
+        """
+        activate the network for many inputs at once, one matrix product per layer
+        :param inputs: array (count, num_inputs)
+        :return: array (count, num_outputs)
+        """
+        inputs = np.asarray(inputs, dtype=np.float64)
+        values = np.zeros(inputs.shape[:-1] + (self.num_values + 1,))
+        values[..., :self.num_inputs] = inputs
+        start = self.num_inputs
+        for weight, bias, response, act, groups in self.layers:
+            z = bias + response * (values[..., :start] @ weight.T)
+            end = start + len(bias)
+            if len(groups) == 1:
+                values[..., start:end] = groups[0][0](z)
+            else:
+                for f, nodes in groups:
+                    values[..., start + nodes] = f(z[..., nodes])
+            start = end
+        return values[..., self.out_slot]
@@ -0,0 +1,122 @@
+"""
+Per-frame timing of the game loop. The loops in flappy_bird_neat and
+flappy_core split every frame into phases and report them here; at the
+end of a generation a summary line is printed and, optionally, every
+frame is written to a CSV or JSON file.
+Disabled by default; the loops read PROFILER.enabled into a local flag
+once per generation, so leaving the calls in costs next to nothing.
+"""
+import json
+import os
+import time
+
+
+class FrameProfiler:
+    """
+    records how long every phase of every frame takes
+    """
+    # events: event pump and frame limiter, pipes: Pipe.move and Pipe.collide
+    PHASES = ("events", "move", "activate", "pipes", "bookkeeping", "draw")
+
+    def __init__(self, enabled=False, dump=None):
+        """
+        Initialize the profiler
+        :param enabled: record timings (bool)
+        :param dump: path of a .csv or .json file for the per-frame timings, None for no file
+        :return: None
+        """
+        self.enabled = enabled
+        self.dump = dump
+        self.summaries = []
+        self.start_generation(0)
+
+    def start_generation(self, generation):
+        """
+        reset the counters for a new generation
+        :param generation: int
+        :return: None
+        """
+        self.generation = generation
+        self.totals = dict.fromkeys(self.PHASES, 0.0)
+        self.frames = []      # (alive, time per phase) for every frame
+        self.started = self.mark = time.perf_counter()
+        self.current = dict.fromkeys(self.PHASES, 0.0)
+
+    def start_frame(self):
+        """
+        start timing a frame
+        :return: None
+        """
+        self.current = dict.fromkeys(self.PHASES, 0.0)
+        self.mark = time.perf_counter()
+
+    def lap(self, phase):
+        """
+        add the time since the last lap (or start_frame) to phase
+        :param phase: one of PHASES (str)
+        :return: None
+        """
+        now = time.perf_counter()
+        self.current[phase] += now - self.mark
+        self.mark = now
+
+    def end_frame(self, alive):
+        """
+        finish the frame
+        :param alive: number of birds alive at the end of the frame (int)
+        :return: None
+        """
+        for phase, seconds in self.current.items():
+            self.totals[phase] += seconds
+        self.frames.append((alive, self.current))
+
+    def end_generation(self):
+        """
+        print the summary of the generation and write the dump file
+        :return: dict with the summary
+        """
+        wall = time.perf_counter() - self.started
+        count = len(self.frames)
+        summary = {
+            "generation": self.generation,
+            "frames": count,
+            "seconds": wall,
+            "fps": count / wall if wall > 0 else 0.0,
+            "alive_per_frame": sum(alive for alive, _ in self.frames) / count if count else 0.0,
+            "phase_seconds": dict(self.totals),
+        }
+        self.summaries.append(summary)
+
+        phases = " ".join("{} {:.3f}".format(phase, 1000 * seconds / count if count else 0.0)
+                          for phase, seconds in self.totals.items())
+        print("gen {}: {} frames in {:.2f}s ({:.1f} fps), {:.1f} birds/frame | ms/frame: {}".format(
+            self.generation, count, wall, summary["fps"], summary["alive_per_frame"], phases))
+
+        if self.dump:
+            self.write(self.dump)
+        return summary
+
+    def write(self, path):
+        """
+        write the frames of this generation to path, csv rows are appended,
+        json files hold every generation summary plus the frames of the last one
+        :param path: .csv or .json file
+        :return: None
+        """
+        if path.endswith(".json"):
+            data = {"generations": self.summaries,
+                    "frames": [dict(times, alive=alive) for alive, times in self.frames]}
+            with open(path, "w") as f:
+                json.dump(data, f)
+            return
+
+        new = not os.path.exists(path)
+        with open(path, "a") as f:
+            if new:
+                f.write(",".join(("generation", "frame", "alive") + self.PHASES) + "\n")
+            for frame, (alive, times) in enumerate(self.frames):
+                f.write(",".join([str(self.generation), str(frame), str(alive)] +
+                                 ["{:.9f}".format(times[phase]) for phase in self.PHASES]) + "\n")
+
+
+PROFILER = FrameProfiler()
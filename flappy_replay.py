@@ -0,0 +1,230 @@
+"""
+Replays of evaluated games. The game only depends on the pipe course and
+on when each bird jumps, so a replay stores the course seed and one bit
+per bird per frame (did it jump) and nothing else. eval_genomes records
+into RECORDER and writes one small .npz file per generation; Replay
+plays such a file back and can jump to any frame through keyframes.
+"""
+import copy
+import os
+import numpy as np
+import flappy_core
+from flappy_core import PipeQueue, Base, WIN_WIDTH, FLOOR
+
+VERSION = 1
+KEYFRAME_INTERVAL = 100
+
+
+class ReplayRecorder:
+    """
+    collects the jumps of every bird during a generation and writes them
+    to directory at the end of it
+    """
+
+    def __init__(self, directory=None):
+        """
+        Initialize the recorder
+        :param directory: folder for the replays, None records nothing (str)
+        :return: None
+        """
+        self.directory = directory
+        self.enabled = directory is not None
+        self.start_generation(0, 0, [])
+
+    def start_generation(self, generation, seed, keys):
+        """
+        start recording a generation
+        :param generation: int
+        :param seed: seed of the pipe course (int)
+        :param keys: genome keys, in the order of the birds
+        :return: None
+        """
+        self.generation = generation
+        self.seed = seed
+        self.keys = list(keys)
+        self.streams = {key: [] for key in self.keys}
+
+    def step(self, key, jumped):
+        """
+        record a frame of a living bird
+        :param key: genome key of the bird
+        :param jumped: did the bird jump this frame (bool)
+        :return: None
+        """
+        self.streams[key].append(jumped)
+
+    def path(self, generation):
+        """
+        file name of the replay of a generation
+        :param generation: int
+        :return: str
+        """
+        return os.path.join(self.directory, "gen-{:04d}.npz".format(generation))
+
+    def end_generation(self):
+        """
+        write the replay of the generation
+        :return: path of the file (str)
+        """
+        frames = [len(self.streams[key]) for key in self.keys]
+        jumps = np.zeros((len(self.keys), max(frames + [1])), dtype=bool)
+        for row, key in enumerate(self.keys):
+            jumps[row, :frames[row]] = self.streams[key]
+
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.path(self.generation)
+        Replay(self.generation, self.seed, self.keys, frames, jumps).save(path)
+        return path
+
+
+class ReplayState:
+    """
+    the game as it is after a number of frames of a replay
+    """
+
+    def __init__(self, replay):
+        """
+        the state before the first frame
+        :param replay: Replay
+        :return: None
+        """
+        self.frame = 0
+        self.birds = flappy_core.bird_population(len(replay.keys))
+        self.birds.alive = replay.frames > 0
+        self.pipes = PipeQueue()
+        self.pipes.spawn(700, replay.course.height(0))
+        self.next_pipe = 1   # index in de course van de volgende pipe
+        self.base = Base(FLOOR)
+        self.score = 0
+
+    def step(self, replay):
+        """
+        play one frame, in the same order as eval_genomes. Collisions are
+        not tested, the recording says when every bird died.
+        :param replay: Replay
+        :return: None
+        """
+        f = self.frame
+        self.birds.move()
+        self.birds.jump(replay.jumps[:, f])
+        self.base.move()
+
+        self.pipes.move()
+        if self.pipes.pass_birds(self.birds.x):
+            self.score += 1
+            self.pipes.spawn(WIN_WIDTH, replay.course.height(self.next_pipe))
+            self.next_pipe += 1
+        self.pipes.retire_gone()
+
+        # wie er in dit frame dood ging, is nu weg
+        self.frame += 1
+        self.birds.alive = replay.frames > self.frame
+
+    def copy(self):
+        """
+        a copy that can be stepped without changing this state
+        :return: ReplayState
+        """
+        state = copy.copy(self)
+        state.birds = copy.deepcopy(self.birds)
+        state.pipes = self.pipes.copy()
+        state.base = copy.copy(self.base)
+        return state
+
+
+class Replay:
+    """
+    the recorded game of a generation
+    """
+
+    def __init__(self, generation, seed, keys, frames, jumps):
+        """
+        Initialize the replay
+        :param generation: int
+        :param seed: seed of the pipe course (int)
+        :param keys: genome key per bird
+        :param frames: number of frames every bird lived
+        :param jumps: bool array (birds, frames), True where a bird jumped
+        :return: None
+        """
+        self.generation = generation
+        self.seed = seed
+        self.keys = np.asarray(keys, dtype=np.int64)
+        self.frames = np.asarray(frames, dtype=np.int64)
+        self.jumps = np.asarray(jumps, dtype=bool)
+        self.course = flappy_core.Course(seed)
+        self.keyframes = None
+
+    def __len__(self):
+        return int(self.frames.max()) if len(self.frames) else 0
+
+    def save(self, path):
+        """
+        write the replay, the jumps are packed to one bit per frame
+        :param path: .npz file (str)
+        :return: None
+        """
+        np.savez_compressed(path, version=VERSION, generation=self.generation, seed=self.seed,
+                            keys=self.keys, frames=self.frames, jumps=np.packbits(self.jumps, axis=1))
+
+    @staticmethod
+    def load(path):
+        """
+        read a replay written by save
+        :param path: .npz file (str)
+        :return: Replay
+        """
+        with np.load(path) as data:
+            if int(data["version"]) != VERSION:
+                raise ValueError("unsupported replay version {} in {}".format(int(data["version"]), path))
+            frames = data["frames"]
+            length = int(frames.max()) if len(frames) else 0
+            jumps = np.unpackbits(data["jumps"], axis=1, count=length).astype(bool)
+            return Replay(int(data["generation"]), int(data["seed"]), data["keys"], frames, jumps)
+
+    def start(self):
+        """
+        the state before the first frame
+        :return: ReplayState
+        """
+        return ReplayState(self)
+
+    def build_keyframes(self, interval=KEYFRAME_INTERVAL):
+        """
+        play the whole replay once and keep a copy of the state every
+        interval frames, so seek does not have to start at the beginning
+        :param interval: frames between keyframes (int)
+        :return: None
+        """
+        self.keyframes = [self.start()]
+        self.keyframe_interval = interval
+        state = self.start()
+        while state.frame < len(self):
+            state.step(self)
+            if state.frame % interval == 0:
+                self.keyframes.append(state.copy())
+
+    def seek(self, frame):
+        """
+        the state after the given number of frames
+        :param frame: int
+        :return: ReplayState
+        """
+        if self.keyframes is None:
+            self.build_keyframes()
+        frame = max(0, min(frame, len(self)))
+        state = self.keyframes[min(frame // self.keyframe_interval, len(self.keyframes) - 1)].copy()
+        while state.frame < frame:
+            state.step(self)
+        return state
+
+    def bird(self, key):
+        """
+        row of the bird of a genome
+        :param key: genome key
+        :return: int
+        """
+        return int(np.flatnonzero(self.keys == key)[0])
+
+
+RECORDER = ReplayRecorder()
@@ -0,0 +1,330 @@
+"""
+Vectorized flappy bird physics for a whole population of birds.
+All birds live in NumPy arrays (struct of arrays) instead of one
+Bird object per genome, so a frame costs a handful of array
+operations no matter how many birds are alive.
+The geometry of the game (floor, where the birds start, the sizes of
+the images) is not copied here, flappy_core passes its own values in,
+see flappy_core.bird_population.
+"""
+import numpy as np
+
+JUMP_VEL = -10.5
+MAX_ROTATION = 25
+ROT_VEL = 20
+TERMINAL_VEL = 16
+CEILING = -50
+
+
+class Trajectory:
+    """
+    the flight of a bird that does not jump, as a lookup table indexed by
+    tick_count. Bird.move only depends on the ticks since the last jump and
+    the velocity of that jump, and after a few ticks the displacement stays
+    at the terminal 16 and the tilt at its lowest value, so the table is
+    short and everything after its last entry follows in closed form.
+    y - height never comes closer than 3 pixels to 50, so the tilt only
+    depends on the ticks as well.
+    """
+
+    def __init__(self, vel, tilt=0, max_rotation=MAX_ROTATION, rot_vel=ROT_VEL):
+        """
+        Build the table
+        :param vel: velocity at tick 0 (float)
+        :param tilt: tilt at tick 0, makes no difference after a jump (float)
+        :return: None
+        """
+        self.vel = vel
+        displacement = [0.0]
+        offset = [0.0]   # y - y at tick 0
+        tilts = [tilt]
+
+        t = 0
+        while not (displacement[-1] == TERMINAL_VEL and offset[-1] >= 50 and tilt <= -90):
+            t += 1
+            # zelfde berekening als Bird.move zodat de floats gelijk zijn
+            d = vel*t + 0.5*(3)*t**2
+            if d >= TERMINAL_VEL:
+                d = (d/abs(d)) * TERMINAL_VEL
+            if d < 0:
+                d -= 2
+
+            if d < 0 or offset[-1] + d < 50:
+                if tilt < max_rotation:
+                    tilt = max_rotation
+            elif tilt > -90:
+                tilt -= rot_vel
+
+            displacement.append(d)
+            offset.append(offset[-1] + d)
+            tilts.append(tilt)
+
+        self.last = t   # vanaf hier verandert alleen nog de y
+        self.steps = list(zip(displacement, tilts))
+        self.displacement = np.array(displacement)
+        self.tilt = np.array(tilts, dtype=np.float64)
+
+    def step(self, tick):
+        """
+        displacement and tilt of the move() that makes tick_count tick
+        :param tick: tick_count after the move (int)
+        :return: (displacement, tilt)
+        """
+        return self.steps[tick if tick < self.last else self.last]
+
+
+FALL = Trajectory(0)          # een vogel die nog nooit gesprongen heeft
+JUMP = Trajectory(JUMP_VEL)   # na een sprong
+MAX_CLIMB = -min(JUMP.displacement)   # 20 pixels omhoog is het snelst
+
+
+def trajectory(vel):
+    """
+    the trajectory that starts with the given velocity
+    :param vel: velocity set by the last jump, 0 before the first jump (float)
+    :return: Trajectory
+    """
+    if vel == JUMP_VEL:
+        return JUMP
+    if vel == 0:
+        return FALL
+    return Trajectory(vel)
+
+
+class BirdPopulation:
+    """
+    represents all birds of a generation, same rules as Bird.move
+    """
+
+    def __init__(self, size, x, y, bird_size, pipe_size):
+        """
+        Initialize the population
+        :param size: number of birds (int)
+        :param x: x pos shared by every bird (int)
+        :param y: starting y pos (int)
+        :param bird_size: (width, height) of the bird image
+        :param pipe_size: (width, height) of the pipe image
+        :return: None
+        """
+        self.x = x
+        self.start_y = y
+        self.bird_w, self.bird_h = bird_size
+        self.pipe_w, self.pipe_h = pipe_size
+
+        self.y = np.full(size, y, dtype=np.float64)
+        self.vel = np.zeros(size, dtype=np.float64)
+        self.tick_count = np.zeros(size, dtype=np.int64)
+        self.height = self.y.copy()
+        self.tilt = np.zeros(size, dtype=np.float64)
+        self.alive = np.ones(size, dtype=bool)
+
+    def __len__(self):
+        return len(self.y)
+
+    def reset(self, rows):
+        """
+        put the selected birds back at the start, alive
+        :param rows: bool array or indices of the birds
+        :return: None
+        """
+        y = self.start_y
+        self.y[rows] = y
+        self.vel[rows] = 0
+        self.tick_count[rows] = 0
+        self.height[rows] = y
+        self.tilt[rows] = 0
+        self.alive[rows] = True
+
+    def jump(self, jumping):
+        """
+        make the selected living birds jump
+        :param jumping: bool array, one entry per bird
+        :return: None
+        """
+        jumping = jumping & self.alive
+        self.vel[jumping] = JUMP_VEL
+        self.tick_count[jumping] = 0
+        self.height[jumping] = self.y[jumping]
+
+    def move(self):
+        """
+        move every living bird one frame, see Bird.move
+        :return: None
+        """
+        alive = self.alive
+        self.tick_count[alive] += 1
+        t = self.tick_count[alive]
+
+        # opzoeken in de Trajectory tabellen in plaats van uitrekenen
+        jumped = self.vel[alive] == JUMP_VEL
+        fall, jump = np.minimum(t, FALL.last), np.minimum(t, JUMP.last)
+        self.y[alive] += np.where(jumped, JUMP.displacement[jump], FALL.displacement[fall])
+        self.tilt[alive] = np.where(jumped, JUMP.tilt[jump], FALL.tilt[fall])
+
+    def frames_until_out_possible(self, floor):
+        """
+        fewest frames after which any living bird could hit the floor or fly
+        over the ceiling, whatever it does. No bird falls faster than
+        TERMINAL_VEL or climbs faster than MAX_CLIMB per frame.
+        :param floor: y of the floor (int)
+        :return: int, at least 1
+        """
+        y = self.y[self.alive]
+        if len(y) == 0:
+            return 1
+        down = np.ceil((floor - self.bird_h + 10 - y) / TERMINAL_VEL)
+        up = np.floor((y - CEILING) / MAX_CLIMB) + 1
+        return max(int(min(down.min(), up.min())), 1)
+
+    def kill_out_of_bounds(self, floor):
+        """
+        kill living birds that hit the floor or flew over the top of the screen
+        :param floor: y of the floor (int)
+        :return: bool array of the birds that died
+        """
+        dead = self.alive & ((self.y + self.bird_h - 10 >= floor) | (self.y < CEILING))
+        self.alive &= ~dead
+        return dead
+
+    def collide(self, pipe_x, pipe_height, pipe_bottom, narrow_phase=None):
+        """
+        kill living birds that hit a pipe. Birds that touch the rectangle of
+        the top or bottom pipe are handed to narrow_phase for the exact test.
+        The pipe can also be given per bird, for birds that each play their
+        own game (see flappy_env).
+        :param pipe_x: x of the pipe (int or int array, one per bird)
+        :param pipe_height: bottom edge of the top pipe (int or int array)
+        :param pipe_bottom: top edge of the bottom pipe (int or int array)
+        :param narrow_phase: function(dx, top_dy, bottom_dy) -> bool array, where
+            dx is the pipe offset (int or one per candidate) and top_dy/bottom_dy
+            the mask offsets per candidate. None counts touching the rectangle as a hit.
+        :return: bool array of the birds that died
+        """
+        dead = np.zeros(len(self.y), dtype=bool)
+        dx = pipe_x - self.x
+        if np.ndim(dx) == 0:
+            if dx >= self.bird_w or pipe_x + self.pipe_w <= self.x:
+                return dead
+            near_x = True
+        else:
+            near_x = (dx < self.bird_w) & (pipe_x + self.pipe_w > self.x)
+
+        # same rounding as round(bird.y)
+        bird_y = np.round(self.y).astype(np.int64)
+        top = pipe_height - self.pipe_h
+        near_top = (bird_y < pipe_height) & (bird_y + self.bird_h > top)
+        near_bottom = (bird_y < pipe_bottom + self.pipe_h) & (bird_y + self.bird_h > pipe_bottom)
+        candidates = np.flatnonzero(self.alive & near_x & (near_top | near_bottom))
+        if len(candidates) == 0:
+            return dead
+
+        if narrow_phase is None:
+            dead[candidates] = True
+        else:
+            if np.ndim(dx):
+                dx = dx[candidates]
+            if np.ndim(top):
+                top, pipe_bottom = top[candidates], pipe_bottom[candidates]
+            dead[candidates] = narrow_phase(dx, top - bird_y[candidates], pipe_bottom - bird_y[candidates])
+
+        self.alive &= ~dead
+        return dead
+
+
+class RowExtents:
+    """
+    the silhouette of a sprite as the horizontal runs of solid pixels in
+    every row, padded with empty (0, 0) runs so every row has as many. Two
+    silhouettes share a pixel exactly when, in some row that both cover,
+    a run of one intersects a run of the other, so an overlap test is a
+    few interval comparisons per row instead of a pixel mask test.
+    """
+
+    def __init__(self, pixels):
+        """
+        Initialize the runs of a sprite
+        :param pixels: bool array (height, width), True where the sprite is solid
+        :return: None
+        """
+        pixels = np.asarray(pixels, dtype=bool)
+        self.height, self.width = pixels.shape
+        padded = np.zeros((self.height, self.width + 2), dtype=np.int8)
+        padded[:, 1:-1] = pixels
+        edges = np.diff(padded, axis=1)          # +1 waar een run begint, -1 net na het einde
+        rows, starts = np.nonzero(edges == 1)
+        ends = np.nonzero(edges == -1)[1]        # zelfde volgorde: per rij van links naar rechts
+        counts = np.bincount(rows, minlength=self.height)
+        runs = max(int(counts.max()) if len(counts) else 0, 1)
+        column = np.arange(len(rows)) - np.repeat(np.cumsum(counts) - counts, counts)
+
+        self.starts = np.zeros((self.height, runs), dtype=np.int64)
+        self.ends = np.zeros((self.height, runs), dtype=np.int64)
+        self.starts[rows, column] = starts
+        self.ends[rows, column] = ends
+
+    def bands(self):
+        """
+        the rows split into bands of consecutive rows with the same runs,
+        without the bands of empty rows
+        :return: list of (first row, row after the last, starts, ends)
+        """
+        same = (np.diff(self.starts, axis=0) == 0).all(axis=1) & (np.diff(self.ends, axis=0) == 0).all(axis=1)
+        edges = np.concatenate(([0], np.flatnonzero(~same) + 1, [self.height]))
+        return [(int(top), int(bottom), self.starts[top], self.ends[top])
+                for top, bottom in zip(edges[:-1], edges[1:]) if self.ends[top].any()]
+
+
+class ExtentOverlap:
+    """
+    overlap test of a sprite with another sprite placed at an offset, for
+    many offsets at once, from the RowExtents of both. The other sprite
+    (a pipe) is a few bands of identical rows. Whether a row of the sprite
+    meets a band only depends on dx, so for every band and dx the table
+    holds the first row at or below each row that meets it. A test is then
+    one lookup and one comparison per band: does the first such row at or
+    below the top of the band lie above its bottom.
+    """
+
+    def __init__(self, sprite, other):
+        """
+        Initialize the table, both sprites as RowExtents
+        :param sprite: RowExtents of the sprite at the origin (the bird)
+        :param other: RowExtents of the sprite at the offsets (the pipe)
+        :return: None
+        """
+        self.height = sprite.height
+        dxs = np.arange(1 - other.width, sprite.width)   # daarbuiten liggen ze naast elkaar
+        self.min_dx = int(dxs[0])
+        bands = other.bands()
+        self.band_top = np.array([top for top, bottom, starts, ends in bands], dtype=np.int64)[:, None]
+        self.band_bottom = np.array([bottom for top, bottom, starts, ends in bands], dtype=np.int64)[:, None]
+        self.band = np.arange(len(bands))[:, None]
+
+        rows = np.arange(sprite.height)
+        self.first_hit = np.full((len(bands), len(dxs), sprite.height + 1), sprite.height, dtype=np.int64)
+        for band, (top, bottom, starts, ends) in enumerate(bands):
+            # (dx, rij, runs van sprite, runs van de band); lege runs snijden nooit
+            shift = dxs[:, None, None, None]
+            low = np.maximum(sprite.starts[None, :, :, None], starts + shift)
+            high = np.minimum(sprite.ends[None, :, :, None], ends + shift)
+            hit_rows = np.where((low < high).any(axis=(2, 3)), rows, sprite.height)
+            self.first_hit[band, :, :-1] = np.minimum.accumulate(hit_rows[:, ::-1], axis=1)[:, ::-1]
+
+    def __call__(self, dx, dy):
+        """
+        does the other sprite, with its top left corner at (dx, dy) from the
+        top left corner of the sprite, share a pixel with it? The same answer
+        as sprite_mask.overlap(other_mask, (dx, dy)) is not None.
+        :param dx: x offsets (int, or array with one per offset)
+        :param dy: y offsets (int array)
+        :return: bool array, one per offset
+        """
+        dy = np.asarray(dy, dtype=np.int64)
+        column = np.asarray(dx, dtype=np.int64) - self.min_dx
+        near = (column >= 0) & (column < self.first_hit.shape[1])
+        column = np.where(near, column, 0)
+
+        # (band, offset)
+        row = np.minimum(np.maximum(self.band_top + dy, 0), self.height)
+        first = self.first_hit[self.band, column, row]
+        return (first < np.minimum(self.band_bottom + dy, self.height)).any(axis=0) & near
@@ -0,0 +1,224 @@
+"""
+Snapshots of a running game for spectating. The training loop runs at
+full speed and, when the window is ready for a new picture, copies the
+few numbers needed to draw a frame (bird y and tilt, pipes, floor,
+score) into a double buffer in shared memory. The window lives in its
+own process (see flappy_bird_neat.spectate), shows the newest snapshot
+at a fixed frame rate and never sees the frames in between. Drawing
+never holds the GIL of the training, and a frame that is not published
+costs the training one read of a shared flag. With a single CPU the two
+processes still share that CPU, flappy_bench has *_spectate scenarios
+that measure what watching costs.
+"""
+import multiprocessing
+from multiprocessing import shared_memory
+import numpy as np
+from flappy_core import PipeQueue
+
+# de toestand van de buffer, in STATE
+READY = 0     # het venster wil een nieuwe snapshot
+FRESH = 1     # er staat een snapshot klaar die het venster nog niet heeft
+CLOSED = 2    # het venster is dicht, niets meer publiceren
+
+# plekken in de header
+STATE, FRONT, STOP, PUBLISHED, SHOWN = range(5)
+HEADER = 5
+
+# de getallen van een snapshot, in het "ints" veld
+INTS = ("birds", "pipe_ind", "base_x1", "base_x2", "score", "generation", "frame",
+        "head", "count", "cursor", "unpassed")
+
+
+def snapshot_dtype(capacity):
+    """
+    the layout of one snapshot in shared memory
+    :param capacity: most birds in a snapshot (int)
+    :return: numpy dtype
+    """
+    pipes = PipeQueue.CAPACITY
+    return np.dtype([("ints", np.int64, len(INTS)),
+                     ("bird_y", np.float64, capacity), ("bird_tilt", np.float64, capacity),
+                     ("x", np.int64, pipes), ("height", np.int64, pipes), ("top", np.int64, pipes),
+                     ("bottom", np.int64, pipes), ("passed", np.bool_, pipes)])
+
+
+class Snapshot:
+    """
+    everything needed to draw one frame, as views of one half of the
+    shared double buffer
+    """
+
+    def __init__(self, record):
+        """
+        Initialize the snapshot
+        :param record: the numpy record of this half of the buffer
+        :return: None
+        """
+        self.record = record
+        self.ints = record["ints"]
+        self.bird_y = record["bird_y"]
+        self.bird_tilt = record["bird_tilt"]
+        self.pipes = PipeQueue()
+        for name in PipeQueue.ARRAYS:
+            setattr(self.pipes, name, record[name])   # de pipes tekenen rechtstreeks uit de buffer
+        self.read()
+
+    def read(self):
+        """
+        take over the numbers the simulation wrote
+        :return: None
+        """
+        values = dict(zip(INTS, self.ints.tolist()))
+        self.birds = values["birds"]          # levende vogels, de eerste zoveel plekken van de arrays
+        self.pipe_ind = values["pipe_ind"]
+        self.base_x = (values["base_x1"], values["base_x2"])
+        self.score = values["score"]
+        self.generation = values["generation"]
+        self.frame = values["frame"]
+        pipes = self.pipes
+        pipes.head, pipes.count, pipes.cursor, pipes.unpassed = (values["head"], values["count"],
+                                                                 values["cursor"], values["unpassed"])
+
+
+class SnapshotBuffer:
+    """
+    double buffer in shared memory between the simulation and the window
+    process. The simulation only writes when the window took the last
+    snapshot, into the half the window is not drawing, so neither side
+    waits for the other. The simulation side creates the buffer, the
+    window process attaches to it by name, see attach.
+    """
+
+    def __init__(self, capacity, name=None, lock=None):
+        """
+        Initialize the buffer
+        :param capacity: most birds in a snapshot, the rest of a bigger population is not shown (int)
+        :param name: name of the shared memory to attach to, None creates it
+        :param lock: the multiprocessing.Lock of the buffer, needed with name
+        :return: None
+        """
+        dtype = snapshot_dtype(capacity)
+        self.capacity = capacity
+        self.owner = name is None
+        if self.owner:
+            self.memory = shared_memory.SharedMemory(create=True, size=8 * HEADER + 2 * dtype.itemsize)
+            self.lock = multiprocessing.Lock()
+        else:
+            self.memory = shared_memory.SharedMemory(name=name)
+            self.lock = lock
+        self.name = self.memory.name
+        self.view = self.memory.buf[:8 * HEADER]
+        self.header = self.view.cast("q")   # een index in een memoryview kost minder dan in een numpy array
+        if self.owner:
+            self.header[:] = memoryview(bytes(8 * HEADER)).cast("q")
+        records = np.ndarray(2, dtype, buffer=self.memory.buf, offset=8 * HEADER)
+        self.snapshots = [Snapshot(records[0]), Snapshot(records[1])]
+        self.generation = 0
+        self.frame = 0
+
+    @staticmethod
+    def attach(name, capacity, lock):
+        """
+        the buffer of another process, for the window
+        :param name: SnapshotBuffer.name of that buffer
+        :param capacity: its capacity (int)
+        :param lock: its lock
+        :return: SnapshotBuffer
+        """
+        return SnapshotBuffer(capacity, name, lock)
+
+    def start_generation(self, generation):
+        """
+        tell the buffer a new generation starts
+        :param generation: int
+        :return: None
+        """
+        self.generation = generation
+        self.frame = 0
+
+    def wants(self):
+        """
+        does the window want a new snapshot? Called every frame by the
+        simulation, which counts the frame here as well.
+        :return: bool
+        """
+        self.frame += 1
+        return self.header[STATE] == READY
+
+    def publish(self, bird_y, bird_tilt, pipes, pipe_ind, base_x, score):
+        """
+        copy a frame into the back buffer and make it the front
+        :param bird_y: y of every living bird (sequence of floats)
+        :param bird_tilt: tilt of every living bird (sequence of floats)
+        :param pipes: flappy_core.PipeQueue
+        :param pipe_ind: slot of the pipe the birds look at (int)
+        :param base_x: (x1, x2) of the floor
+        :param score: int
+        :return: None
+        """
+        snap = self.snapshots[1 - self.header[FRONT]]
+        count = min(len(bird_y), self.capacity)
+        snap.bird_y[:count] = bird_y[:count]
+        snap.bird_tilt[:count] = bird_tilt[:count]
+        for name in PipeQueue.ARRAYS:
+            snap.record[name] = getattr(pipes, name)
+        snap.ints[:] = (count, pipe_ind, base_x[0], base_x[1], score, self.generation, self.frame,
+                        pipes.head, pipes.count, pipes.cursor, pipes.unpassed)
+
+        with self.lock:
+            if self.header[STATE] == CLOSED:
+                return
+            self.header[FRONT] = 1 - self.header[FRONT]
+            self.header[STATE] = FRESH
+            self.header[PUBLISHED] += 1
+
+    def take(self):
+        """
+        the newest snapshot, for the window. It stays valid until the next
+        take, the simulation only writes into the other half.
+        :return: Snapshot, None if there is nothing new
+        """
+        with self.lock:
+            if self.header[STATE] != FRESH:
+                return None
+            self.header[STATE] = READY
+            self.header[SHOWN] += 1
+            snap = self.snapshots[self.header[FRONT]]
+        snap.read()
+        return snap
+
+    def stop(self):
+        """
+        ask the window process to close, see stopped
+        :return: None
+        """
+        self.header[STOP] = 1
+
+    def stopped(self):
+        """
+        did the simulation ask the window to close?
+        :return: bool
+        """
+        return self.header[STOP] == 1
+
+    def stats(self):
+        """
+        one line about the snapshots so far, for the log
+        :return: str
+        """
+        return "Spectating: {} frames published, {} shown".format(self.header[PUBLISHED], self.header[SHOWN])
+
+    def close(self):
+        """
+        stop publishing (the window was closed) and let go of the shared
+        memory. The side that created the buffer also removes it.
+        :return: None
+        """
+        with self.lock:
+            self.header[STATE] = CLOSED
+        self.snapshots = []   # de numpy views moeten weg voordat het geheugen dicht kan
+        self.header.release()
+        self.view.release()
+        self.memory.close()
+        if self.owner:
+            self.memory.unlink()